@@ -0,0 +1,65 @@
+import argparse
+import html
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import code_block, page  # noqa: E402
+from html_markdown import code_block_parts, markdown_to_html_node  # noqa: E402
+from htmlnode import escape  # noqa: E402
+from timing import best_of  # noqa: E402
+
+translate_table = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def replace_chain(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def translate(text: str) -> str:
+    return text.translate(translate_table)
+
+
+def html_escape(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Code block rendering and escaping")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--code", type=float, default=0.5, help="Share of code blocks")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [
+        page(rng, f"Post {i}", args.blocks, mix={"code": args.code})
+        for i in range(args.pages)
+    ]
+    render = best_of(
+        lambda md: markdown_to_html_node(md).to_html(), args.repeat, items=pages
+    )
+    size = sum(len(md) for md in pages)
+    print(f"{args.pages} pages, {args.code:.0%} code, {size / 1e6:.2f} MB")
+    print(f"render {render / args.pages * 1e6:8.1f} us/page")
+
+    # bodies of code blocks, most with something to escape, plus the prose
+    # around them, most of which has nothing to escape
+    bodies = [code_block_parts(code_block(rng))[1] for _ in range(5000)]
+    prose = [block for md in pages for block in md.split("\n\n")[1:]]
+    for label, texts in (("code", bodies), ("prose", prose)):
+        chars = sum(len(text) for text in texts)
+        for name, func in (
+            ("escape", escape),
+            ("replace chain", replace_chain),
+            ("str.translate", translate),
+            ("html.escape", html_escape),
+        ):
+            seconds = best_of(func, args.repeat, items=texts)
+            print(
+                f"{label:5} {name:13} {seconds * 1e3:8.1f} ms  "
+                f"{chars / seconds / 1e6:7.1f} MB/s"
+            )
@@ -0,0 +1,44 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import paragraph  # noqa: E402
+from textnode import (  # noqa: E402
+    TextNode,
+    scan_inline,
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+)
+from timing import best_of  # noqa: E402
+
+
+def split_pipeline(text: str) -> list[TextNode]:
+    # the five-pass pipeline text_to_textnodes used before scan_inline
+    nodes = [TextNode(text, "text")]
+    nodes = split_nodes_delimiter(nodes, "**", "bold")
+    nodes = split_nodes_delimiter(nodes, "*", "italic")
+    nodes = split_nodes_delimiter(nodes, "`", "code")
+    nodes = split_nodes_image(nodes)
+    return split_nodes_link(nodes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inline tokenizer microbenchmark")
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paragraphs = [paragraph(rng) for _ in range(args.paragraphs)]
+    size = sum(len(p) for p in paragraphs)
+
+    split = best_of(split_pipeline, args.repeat, items=paragraphs)
+    scan = best_of(scan_inline, args.repeat, items=paragraphs)
+    print(f"{args.paragraphs} paragraphs, {size / 1e6:.2f} MB of text")
+    print(f"split pipeline {split * 1e3:8.1f} ms  {size / split / 1e6:6.2f} MB/s")
+    print(f"scan_inline    {scan * 1e3:8.1f} ms  {size / scan / 1e6:6.2f} MB/s")
+    print(f"speedup x{split / scan:.2f}")
@@ -0,0 +1,49 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import generate_corpus  # noqa: E402
+from main import generate_pages_recursive  # noqa: E402
+
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+def run(content: str, template: str, dest: str, jobs: int) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_pages_recursive(content, template, dest, jobs=jobs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Page throughput by --jobs")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument(
+        "--jobs", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        content = os.path.join(root, "content")
+        template = os.path.join(root, "template.html")
+        with open(template, "w") as f:
+            f.write(TEMPLATE)
+        generate_corpus(content, args.pages, blocks=args.blocks)
+
+        baseline = None
+        for jobs in sorted(set(args.jobs)):
+            elapsed = run(content, template, os.path.join(root, f"out{jobs}"), jobs)
+            baseline = baseline or elapsed
+            print(
+                f"jobs={jobs:<3} {elapsed:7.2f}s "
+                f"{args.pages / elapsed:9.1f} pages/s "
+                f"speedup x{baseline / elapsed:.2f}"
+            )
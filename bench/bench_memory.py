@@ -0,0 +1,86 @@
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import page  # noqa: E402
+from html_markdown import markdown_to_html_node  # noqa: E402
+from htmlnode import LeafNode, ParentNode  # noqa: E402
+from textnode import TextNode  # noqa: E402
+
+
+class DictTextNode:
+    # the layout TextNode had before __slots__, for comparison
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def peak(func) -> int:
+    tracemalloc.start()
+    try:
+        result = func()
+        del result
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def corpus_markdown(size: int) -> str:
+    rng = random.Random(0)
+    parts = []
+    total = 0
+    while total < size:
+        parts.append(page(rng, f"Page {len(parts)}"))
+        total += len(parts[-1])
+    return "\n".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="tracemalloc peak per MB")
+    parser.add_argument("--mb", type=float, default=1.0)
+    parser.add_argument("--objects", type=int, default=100_000)
+    args = parser.parse_args()
+
+    markdown = corpus_markdown(int(args.mb * 1e6))
+    mb = len(markdown.encode()) / 1e6
+    parse = peak(lambda: markdown_to_html_node(markdown))
+    print(f"{mb:.2f} MB of markdown")
+    print(f"markdown_to_html_node peak {parse / mb / 1e6:8.2f} MB per MB")
+
+    n = args.objects
+    print(f"\npeak for {n} instances   slotted    __dict__   saved")
+    for name, slotted, plain in [
+        (
+            "TextNode",
+            lambda: [TextNode("t", "text") for _ in range(n)],
+            lambda: [DictTextNode("t", "text") for _ in range(n)],
+        ),
+        (
+            "LeafNode",
+            lambda: [LeafNode("b", "t") for _ in range(n)],
+            lambda: [DictHTMLNode("b", "t") for _ in range(n)],
+        ),
+        (
+            "ParentNode",
+            lambda: [ParentNode("p", []) for _ in range(n)],
+            lambda: [DictHTMLNode("p", None, []) for _ in range(n)],
+        ),
+    ]:
+        small, large = peak(slotted), peak(plain)
+        print(
+            f"{name:<22} {small / 1e6:7.2f} MB {large / 1e6:7.2f} MB "
+            f"{1 - small / large:6.1%}"
+        )
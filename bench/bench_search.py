@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import WORDS, generate_corpus  # noqa: E402
+from main import find_pages  # noqa: E402
+from search_index import SEARCH_DIR, SearchIndex, search  # noqa: E402
+from site_index import SiteIndex  # noqa: E402
+
+
+def build(index: SearchIndex, pages: list, root: str) -> tuple[float, int]:
+    # the site index scan it depends on isn't part of the timing
+    index.site_index.update(pages, root)
+    start = time.perf_counter()
+    index.update()
+    shards = index.write(root)
+    return time.perf_counter() - start, shards
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return sorted(samples)[int(fraction * (len(samples) - 1))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search index build and lookup")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--changed", type=int, default=10, help="Pages edited")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as root:
+        content = os.path.join(root, "content")
+        out = os.path.join(root, "public")
+        generate_corpus(content, args.pages, args.seed, args.blocks)
+        pages = find_pages(content, out)
+        site_index = SiteIndex(os.path.join(root, "site.sqlite"))
+        index = SearchIndex(site_index)
+
+        cold, shards = build(index, pages, out)
+        print(f"cold build: {cold * 1e3:8.1f} ms, {shards} shards")
+        warm, shards = build(index, pages, out)
+        print(f"no changes: {warm * 1e3:8.1f} ms, {shards} shards rewritten")
+        for source, _ in rng.sample(pages, args.changed):
+            with open(source, "a") as f:
+                f.write(f"\n\n{' '.join(rng.choice(WORDS) for _ in range(12))}\n")
+        edited, shards = build(index, pages, out)
+        print(
+            f"{args.changed} edited: {edited * 1e3:8.1f} ms, "
+            f"{shards} shards rewritten"
+        )
+
+        directory = os.path.join(out, SEARCH_DIR)
+        sizes = [entry.stat().st_size for entry in os.scandir(directory)]
+        print(
+            f"index size: {sum(sizes) / 1024:8.0f} KiB in {len(sizes)} files, "
+            f"{sum(sizes) / args.pages:.0f} bytes per page, "
+            f"largest shard {max(sizes) / 1024:.0f} KiB"
+        )
+
+        # a cold lookup loads its shards and docs.json from disk, as a
+        # browser's first query does; a warm one reuses loaded shards
+        for label, shared in (("cold", None), ("warm", {})):
+            samples = []
+            for _ in range(args.queries):
+                query = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+                start = time.perf_counter()
+                search(directory, query, shared)
+                samples.append(time.perf_counter() - start)
+            print(
+                f"{label} lookup: median {percentile(samples, 0.5) * 1e3:6.2f} ms, "
+                f"p95 {percentile(samples, 0.95) * 1e3:6.2f} ms"
+            )
+        with open(os.path.join(directory, "docs.json")) as f:
+            print(f"docs.json: {len(json.load(f)['docs'])} pages")
+        site_index.close()
@@ -0,0 +1,87 @@
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# runs server.py in its own process so its CPU time isn't mixed with the
+# client's; prints the port, then the CPU seconds it spent once stdin closes
+SERVER = """
+import sys, threading, time
+sys.path.insert(0, sys.argv[1])
+import server
+
+class Handler(server.CORSHTTPRequestHandler):
+    use_sendfile = sys.argv[3] == "1"
+
+    def log_message(self, format, *args):
+        pass
+
+httpd = server.make_server(
+    handler_class=Handler, port=0, directory=sys.argv[2], backend="single"
+)
+threading.Thread(target=httpd.serve_forever, daemon=True).start()
+start = time.process_time()
+print(httpd.server_address[1], flush=True)
+sys.stdin.read()
+print(time.process_time() - start, flush=True)
+"""
+
+
+def fetch(conn: http.client.HTTPConnection, path: str, headers: dict) -> int:
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    buffer = bytearray(1 << 20)
+    total = 0
+    while n := response.readinto(buffer):
+        total += n
+    return total
+
+
+def run(directory: str, use_sendfile: bool, requests: int, headers: dict):
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER, ROOT, directory, "1" if use_sendfile else "0"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    port = int(server.stdout.readline())
+    conn = http.client.HTTPConnection("localhost", port)
+    start = time.perf_counter()
+    total = sum(fetch(conn, "/blob.bin", headers) for _ in range(requests))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    cpu = float(server.communicate("")[0])
+    return total / elapsed, cpu / requests
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="File serving, sendfile vs copy")
+    parser.add_argument("--size", type=int, default=64, help="File size in MB")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "blob.bin"), "wb") as f:
+            f.write(os.urandom(args.size << 20))
+
+        half = (args.size << 20) // 2
+        cases = [
+            ("full", {}),
+            ("range", {"Range": f"bytes={half}-"}),
+            ("multi", {"Range": f"bytes=0-{half // 2},{half}-"}),
+        ]
+        print(f"{args.requests} requests for a {args.size} MB file")
+        for name, headers in cases:
+            for use_sendfile in (False, True):
+                rate, cpu = run(root, use_sendfile, args.requests, headers)
+                label = "sendfile" if use_sendfile else "copy"
+                print(
+                    f"{name:>5} {label:>8}: {rate / (1 << 20):8.0f} MB/s, "
+                    f"{cpu * 1e3:6.2f} ms server CPU per request"
+                )
@@ -0,0 +1,202 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from corpus import DEFAULT_MIX, generate_corpus, generate_static  # noqa: E402
+from html_markdown import (  # noqa: E402
+    block_to_block_type,
+    block_to_html_node,
+    block_type_paragraph,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+from main import copy_files, extract_title, find_pages  # noqa: E402
+from template import compile_template  # noqa: E402
+from textnode import text_to_textnodes  # noqa: E402
+from timing import best_of  # noqa: E402
+
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+def measure(content: str, static: str, out: str, repeat: int) -> dict:
+    pages = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = find_pages(content, os.path.join(out, "public"))
+    for source, dest in found:
+        with open(source) as f:
+            pages.append((f.read(), dest))
+    markdown = [md for md, _ in pages]
+    blocks = [markdown_to_blocks(md) for md in markdown]
+    typed = [[(b, block_to_block_type(b)) for b in page] for page in blocks]
+    # inline text the paragraph converter would hand to text_to_textnodes
+    inline = [
+        " ".join(b.split("\n"))
+        for page in typed
+        for b, block_type in page
+        if block_type == block_type_paragraph
+    ]
+    nodes = [markdown_to_html_node(md) for md in markdown]
+    html = [node.to_html() for node in nodes]
+    template = compile_template(TEMPLATE)
+    filled = [
+        template.render_to_string({"Title": extract_title(md), "Content": body})
+        for md, body in zip(markdown, html)
+    ]
+    for _, dest in pages:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    def write_files():
+        for text, (_, dest) in zip(filled, pages):
+            with open(dest, "w") as f:
+                f.write(text)
+
+    def copy_cold():
+        copy_files(static, os.path.join(out, f"static{time.perf_counter_ns()}"))
+
+    warm = os.path.join(out, "static-warm")
+    copy_files(static, warm)
+
+    stages = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(md) for md in markdown],
+        "block_to_block_type": lambda: [
+            block_to_block_type(b) for page in blocks for b in page
+        ],
+        "text_to_textnodes": lambda: [text_to_textnodes(t) for t in inline],
+        "block_to_html_node": lambda: [
+            block_to_html_node(b, t) for page in typed for b, t in page
+        ],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(md) for md in markdown],
+        "to_html": lambda: [node.to_html() for node in nodes],
+        "template_fill": lambda: [
+            template.render_to_string({"Title": "", "Content": body}) for body in html
+        ],
+        "file_write": write_files,
+        "copy_files_cold": copy_cold,
+        "copy_files_warm": lambda: copy_files(static, warm),
+    }
+    results = {}
+    for name, func in stages.items():
+        seconds = best_of(func, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "per_page_us": seconds / len(pages) * 1e6,
+        }
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, stage in report["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None:
+            continue
+        ratio = stage["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:>22} {old['seconds']:8.4f}s -> {stage['seconds']:8.4f}s "
+            f"x{ratio:.2f}{flag}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each build stage")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    for kind, weight in DEFAULT_MIX.items():
+        parser.add_argument(
+            f"--{kind.replace('_', '-')}",
+            type=float,
+            default=weight,
+            help=f"Share of {kind.replace('_', ' ')} blocks",
+        )
+    parser.add_argument("--links", type=float, default=0.1, help="Per sentence")
+    parser.add_argument("--images", type=float, default=0.02, help="Per sentence")
+    parser.add_argument("--static-files", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="A previous JSON report to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.1,
+        help="Slowdown ratio that counts as a regression with --compare",
+    )
+    args = parser.parse_args()
+
+    config = {
+        "pages": args.pages,
+        "blocks": args.blocks,
+        "depth": args.depth,
+        "seed": args.seed,
+        "mix": {kind: getattr(args, kind) for kind in DEFAULT_MIX},
+        "links": args.links,
+        "images": args.images,
+        "static_files": args.static_files,
+        "repeat": args.repeat,
+    }
+    with tempfile.TemporaryDirectory() as root:
+        content = os.path.join(root, "content")
+        static = os.path.join(root, "static")
+        generate_corpus(
+            content,
+            args.pages,
+            args.seed,
+            args.blocks,
+            args.depth,
+            config["mix"],
+            args.links,
+            args.images,
+        )
+        generate_static(static, args.static_files, seed=args.seed)
+        stages = measure(content, static, os.path.join(root, "out"), args.repeat)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "stages": stages,
+    }
+    for name, stage in stages.items():
+        print(
+            f"{name:>22} {stage['seconds'] * 1e3:9.2f} ms "
+            f"{stage['per_page_us']:9.1f} us/page"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print("warning: the baseline was measured with a different config")
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
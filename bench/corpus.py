@@ -0,0 +1,122 @@
+import os
+import random
+
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog middle earth shire ring hobbit "
+    "elves dwarves mordor river mountain forest tower road journey fellowship"
+).split()
+
+# relative weights of each block kind on a page; paragraphs take the rest
+DEFAULT_MIX = {
+    "heading": 0.1,
+    "unordered_list": 0.1,
+    "ordered_list": 0.05,
+    "quote": 0.05,
+    "code": 0.0,
+}
+CODE_LINES = [
+    "def fellowship(members):",
+    "    return [m for m in members if m.ready]",
+    "for ring in rings:",
+    "    ring.forge(power=9)",
+    "print(journey.distance)",
+    "def march(*hobbits, **orders):",
+    "    if miles < 10 && not tired: rest(`camp`)",
+]
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def decorate(rng: random.Random, text: str, links: float, images: float) -> str:
+    # links and images are the chance of appending one to a sentence
+    if links and rng.random() < links:
+        word = rng.choice(WORDS)
+        text = f"{text} [{word}](/{word}/{rng.randrange(100)})"
+    if images and rng.random() < images:
+        text = f"{text} ![{rng.choice(WORDS)}](/images/{rng.randrange(20)}.png)"
+    return text
+
+
+def paragraph(rng: random.Random, links: float = 0.0, images: float = 0.0) -> str:
+    parts = []
+    for _ in range(rng.randint(3, 6)):
+        text = sentence(rng)
+        roll = rng.random()
+        if roll < 0.2:
+            text = f"{text} **{rng.choice(WORDS)}**"
+        elif roll < 0.4:
+            text = f"{text} *{rng.choice(WORDS)}*"
+        elif roll < 0.5:
+            text = f"{text} `{rng.choice(WORDS)}`"
+        parts.append(decorate(rng, text, links, images))
+    return " ".join(parts)
+
+
+def code_block(rng: random.Random) -> str:
+    lines = [rng.choice(CODE_LINES) for _ in range(rng.randint(3, 8))]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def page(
+    rng: random.Random,
+    title: str,
+    blocks: int = 20,
+    mix: dict = None,
+    links: float = 0.0,
+    images: float = 0.0,
+) -> str:
+    weights = {**DEFAULT_MIX, **(mix or {})}
+    out = [f"# {title}"]
+    for i in range(blocks):
+        roll = rng.random()
+        if roll < (threshold := weights["heading"]):
+            out.append(f"## {sentence(rng, 4)}")
+        elif roll < (threshold := threshold + weights["unordered_list"]):
+            out.append("\n".join(f"* {sentence(rng, 6)}" for _ in range(5)))
+        elif roll < (threshold := threshold + weights["ordered_list"]):
+            out.append("\n".join(f"{n}. {sentence(rng, 6)}" for n in range(1, 5)))
+        elif roll < (threshold := threshold + weights["quote"]):
+            out.append("\n".join(f"> {sentence(rng)}" for _ in range(3)))
+        elif roll < threshold + weights["code"]:
+            out.append(code_block(rng))
+        else:
+            out.append(paragraph(rng, links, images))
+    return "\n\n".join(out) + "\n"
+
+
+def page_directory(root: str, i: int, depth: int) -> str:
+    # depth levels of ten sections each, then one directory per post
+    sections = [f"section{(i // 10**level) % 10}" for level in range(depth)]
+    return os.path.join(root, *sections, f"post{i}")
+
+
+def generate_corpus(
+    root: str,
+    pages: int,
+    seed: int = 0,
+    blocks: int = 20,
+    depth: int = 1,
+    mix: dict = None,
+    links: float = 0.0,
+    images: float = 0.0,
+) -> None:
+    rng = random.Random(seed)
+    for i in range(pages):
+        directory = page_directory(root, i, depth)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "index.md"), "w") as f:
+            f.write(page(rng, f"Post {i}", blocks, mix, links, images))
+
+
+def generate_static(root: str, files: int, size: int = 64 << 10, seed: int = 0):
+    # the images pages link to, plus a stylesheet
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, "images"), exist_ok=True)
+    with open(os.path.join(root, "index.css"), "w") as f:
+        f.write("body { font-family: serif; }\n" * 64)
+    for i in range(files):
+        with open(os.path.join(root, "images", f"{i}.png"), "wb") as f:
+            f.write(rng.randbytes(size))
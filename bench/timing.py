@@ -0,0 +1,15 @@
+import timeit
+
+
+def best_of(func, repeat: int, items: list = None) -> float:
+    # fastest of repeat runs, in seconds, of func() or, given items, of func
+    # called on each of them
+    if items is None:
+        run = func
+    else:
+
+        def run():
+            for item in items:
+                func(item)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
@@ -1,9 +1,267 @@
 import os
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import datetime
+import email.utils
+import functools
+import hashlib
+import io
+import json
+import secrets
+import shutil
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_MARKER = ".livereload"
+CACHE_STATS_PATH = "/__cache"
+# files larger than this are always streamed from disk, never cached
+MAX_CACHED_FILE = 1 << 20
+BACKENDS = ("threads", "single")
+DEFAULT_WORKERS = 16
+# more ranges than this in one request are ignored and the whole file is sent
+MAX_RANGES = 16
+DEFAULT_CACHE_CONTROL = "no-cache"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# written next to compressible outputs by the build, see src/compress.py
+GZIP_SUFFIX = ".gz"
+# must match FINGERPRINTS_FILE in src/assets.py: the urls of the assets the
+# build fingerprinted, the only files served as immutable
+FINGERPRINTS_FILE = ".fingerprints.json"
+
+
+class FileBody:
+    # a response body as slices of an open file: each part is written as
+    # (prefix bytes, file offset, length), followed by the trailer
+    __slots__ = ("file", "parts", "trailer")
+
+    def __init__(self, file, parts: list[tuple[bytes, int, int]], trailer=b""):
+        self.file = file
+        self.parts = parts
+        self.trailer = trailer
+
+    def close(self):
+        self.file.close()
+
+
+class ETagCache:
+    # strong validators from file contents, only rehashed once the file's
+    # inode, mtime or size change
+    def __init__(self) -> None:
+        self.entries = {}
+
+    def get(self, path: str, f, fs: os.stat_result) -> str:
+        key = (fs.st_ino, fs.st_mtime_ns, fs.st_size)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        f.seek(0)
+        etag = '"' + hashlib.file_digest(f, "sha256").hexdigest()[:32] + '"'
+        self.entries[path] = (key, etag)
+        return etag
+
+
+def stat_key(fs: os.stat_result) -> tuple[int, int, int]:
+    return (fs.st_ino, fs.st_mtime_ns, fs.st_size)
+
+
+def path_key(path: str):
+    try:
+        return stat_key(os.stat(path))
+    except OSError:
+        return None
+
+
+class Fingerprints:
+    # the fingerprint list of the served directory, re-read whenever the
+    # file changes, e.g. when a build publishes a new generation
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.key = None
+        self.urls = frozenset()
+        self.lock = threading.Lock()
+
+    def __contains__(self, url: str) -> bool:
+        key = path_key(self.path)
+        if key != self.key:
+            with self.lock:
+                if key != self.key:
+                    self.urls = self.load()
+                    self.key = key
+        return url in self.urls
+
+    def load(self) -> frozenset:
+        try:
+            with open(self.path) as f:
+                return frozenset(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return frozenset()
+
+
+class CachedFile:
+    __slots__ = ("path", "fs", "etag", "encoding", "data", "validators")
+
+    def __init__(self, path, fs, etag, encoding, data, validators) -> None:
+        self.path = path
+        self.fs = fs
+        self.etag = etag
+        self.encoding = encoding
+        self.data = data
+        # (path, stat_key or None) for every file the response depended on
+        self.validators = validators
+
+    def is_current(self) -> bool:
+        return all(path_key(path) == key for path, key in self.validators)
+
+
+class FileCache:
+    # LRU of small file responses, bounded by the bytes of their bodies; a
+    # hit costs a stat per validator instead of open, fstat and read
+    def __init__(self, max_bytes: int, max_file_bytes: int = MAX_CACHED_FILE):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key) -> CachedFile:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+        if entry.is_current():
+            with self.lock:
+                self.hits += 1
+            return entry
+        with self.lock:
+            self.misses += 1
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+                self.size -= len(entry.data)
+        return None
+
+    def put(self, key, entry: CachedFile) -> None:
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.data)
+            self.entries[key] = entry
+            self.size += len(entry.data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.data)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def etag_matches(header: str, etag: str, weak: bool = True) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags:
+        return True
+    if weak:
+        tags = [tag.removeprefix("W/") for tag in tags]
+    return etag in tags
+
+
+def accepts_gzip(header: str) -> bool:
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted.get("gzip", accepted.get("*", 0.0)) > 0
+
+
+def parse_ranges(header: str, size: int):
+    # returns None if the header should be ignored, an empty list if no range
+    # is satisfiable, otherwise sorted, merged (start, end) inclusive ranges
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            if not last:
+                return None
+            suffix = int(last)
+            if suffix:
+                ranges.append((max(0, size - suffix), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
 
 
 class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # seconds a keep-alive connection may sit idle before it is closed, so a
+    # stalled client can't hold on to a worker
+    timeout = 5
+    # headers and body go out in separate sends; with Nagle on, every
+    # keep-alive response after the first waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+    # set by run(livereload=True): the file a watch build touches after
+    # every rebuild, streamed to open pages as server-sent events
+    livereload_marker = None
+    # send file bodies with socket.sendfile (os.sendfile where the platform
+    # has it) instead of copying them through userspace buffers
+    use_sendfile = True
+    cache_control = DEFAULT_CACHE_CONTROL
+    # fingerprinted names never change content, so caches may keep them
+    immutable_cache_control = IMMUTABLE_CACHE_CONTROL
+    # set by make_server: the Fingerprints of the served directory
+    fingerprints = ()
+    etags = ETagCache()
+    # set by run(cache_size=...): a FileCache shared by every connection
+    file_cache = None
+
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
@@ -12,21 +270,379 @@ class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200, "OK")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
+    def do_GET(self):
+        if self.livereload_marker and self.path == LIVERELOAD_PATH:
+            self.send_livereload()
+            return
+        if self.file_cache is not None and self.path == CACHE_STATS_PATH:
+            self.send_cache_stats()
+            return
+        super().do_GET()
 
-def run(
-    server_class=HTTPServer,
+    def send_head(self):
+        cache_key = None
+        if self.file_cache is not None:
+            cache_key = (
+                self.path.split("?", 1)[0].split("#", 1)[0],
+                accepts_gzip(self.headers.get("Accept-Encoding", "")),
+            )
+            entry = self.file_cache.get(cache_key)
+            if entry is not None:
+                return self.send_file(
+                    io.BytesIO(entry.data),
+                    entry.path,
+                    entry.fs,
+                    entry.etag,
+                    entry.encoding,
+                )
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            parts = urllib.parse.urlsplit(self.path)
+            if not parts.path.endswith("/"):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                new_parts = (parts[0], parts[1], parts[2] + "/", parts[3], parts[4])
+                self.send_header("Location", urllib.parse.urlunsplit(new_parts))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            for index in "index.html", "index.htm":
+                index = os.path.join(path, index)
+                if os.path.isfile(index):
+                    path = index
+                    break
+            else:
+                return self.list_directory(path)
+        if path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            source_fs = os.fstat(f.fileno())
+            f, fs, encoding = self.negotiate_encoding(path, f, source_fs)
+            body_path = path + GZIP_SUFFIX if encoding == "gzip" else path
+            etag = self.etags.get(body_path, f, fs)
+            if cache_key is not None and fs.st_size <= self.file_cache.max_file_bytes:
+                f.seek(0)
+                data = f.read()
+                f.close()
+                gz_path = path + GZIP_SUFFIX
+                gz_key = stat_key(fs) if encoding == "gzip" else path_key(gz_path)
+                validators = ((path, stat_key(source_fs)), (gz_path, gz_key))
+                self.file_cache.put(
+                    cache_key, CachedFile(path, fs, etag, encoding, data, validators)
+                )
+                f = io.BytesIO(data)
+            return self.send_file(f, path, fs, etag, encoding)
+        except BaseException:
+            f.close()
+            raise
+
+    def send_file(self, f, path: str, fs: os.stat_result, etag: str, encoding):
+        if self.is_not_modified(fs, etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_entity_headers(path, fs, etag, encoding)
+            self.end_headers()
+            f.close()
+            return None
+        return self.send_file_head(f, path, fs, etag, encoding)
+
+    def negotiate_encoding(self, path: str, f, fs: os.stat_result):
+        # returns the file to send, its stat and None when the path has no
+        # precompressed variant, or "gzip"/"identity" for the one chosen
+        try:
+            gz = open(path + GZIP_SUFFIX, "rb")
+        except OSError:
+            return f, fs, None
+        gz_fs = os.fstat(gz.fileno())
+        # a .gz left behind by an older build of this file is never served
+        if gz_fs.st_mtime_ns != fs.st_mtime_ns:
+            gz.close()
+            return f, fs, None
+        if not accepts_gzip(self.headers.get("Accept-Encoding", "")):
+            gz.close()
+            return f, fs, "identity"
+        f.close()
+        return gz, gz_fs, "gzip"
+
+    def is_not_modified(self, fs: os.stat_result, etag: str) -> bool:
+        if "If-None-Match" in self.headers:
+            return etag_matches(self.headers["If-None-Match"], etag)
+        if "If-Modified-Since" not in self.headers:
+            return False
+        try:
+            ims = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if ims.tzinfo is None:
+            ims = ims.replace(tzinfo=datetime.timezone.utc)
+        if ims.tzinfo is not datetime.timezone.utc:
+            return False
+        last_modified = datetime.datetime.fromtimestamp(
+            fs.st_mtime, datetime.timezone.utc
+        ).replace(microsecond=0)
+        return last_modified <= ims
+
+    def range_applies(self, fs: os.stat_result, etag: str) -> bool:
+        # If-Range: only honour Range if the client's copy is still current
+        if_range = self.headers.get("If-Range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            return etag_matches(if_range, etag, weak=False)
+        return if_range == self.date_time_string(fs.st_mtime)
+
+    def send_entity_headers(self, path, fs: os.stat_result, etag: str, encoding):
+        if encoding is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding == "gzip":
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(fs.st_mtime))
+        if self.url_path(path) in self.fingerprints:
+            self.send_header("Cache-Control", self.immutable_cache_control)
+        elif self.cache_control:
+            self.send_header("Cache-Control", self.cache_control)
+
+    def url_path(self, path: str) -> str:
+        return "/" + os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+    def send_file_head(self, f, path, fs: os.stat_result, etag: str, encoding=None):
+        ctype = self.guess_type(path)
+        size = fs.st_size
+        ranges = None
+        if "Range" in self.headers and self.range_applies(fs, etag):
+            ranges = parse_ranges(self.headers["Range"], size)
+
+        if ranges == []:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            f.close()
+            return None
+
+        if not ranges:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-type", ctype)
+            self.send_header("Content-Length", str(size))
+            parts = [(b"", 0, size)]
+            trailer = b""
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-type", ctype)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+            parts = [(b"", start, end - start + 1)]
+            trailer = b""
+        else:
+            boundary = secrets.token_hex(16)
+            parts = []
+            for start, end in ranges:
+                prefix = (
+                    f"\r\n--{boundary}\r\n"
+                    f"Content-Type: {ctype}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                parts.append((prefix, start, end - start + 1))
+            trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            length = sum(len(p) + n for p, _, n in parts) + len(trailer)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header(
+                "Content-type", f"multipart/byteranges; boundary={boundary}"
+            )
+            self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_entity_headers(path, fs, etag, encoding)
+        self.end_headers()
+        return FileBody(f, parts, trailer)
+
+    def copyfile(self, source, outputfile):
+        if not isinstance(source, FileBody):
+            super().copyfile(source, outputfile)
+            return
+        for prefix, offset, length in source.parts:
+            if prefix:
+                outputfile.write(prefix)
+            self.copy_file_range(source.file, offset, length, outputfile)
+        if source.trailer:
+            outputfile.write(source.trailer)
+
+    def copy_file_range(self, f, offset: int, length: int, outputfile):
+        if isinstance(f, io.BytesIO):
+            # a cached body: getvalue() shares the cached bytes, no copy
+            outputfile.write(memoryview(f.getvalue())[offset : offset + length])
+            return
+        if self.use_sendfile and outputfile is self.wfile:
+            # falls back to plain sends where os.sendfile isn't available
+            self.connection.sendfile(f, offset, length)
+            return
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            chunk = f.read(min(shutil.COPY_BUFSIZE, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+    def send_cache_stats(self):
+        body = json.dumps(self.file_cache.stats()).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_livereload(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+
+        last = marker_mtime(self.livereload_marker)
+        idle = 0.0
+        try:
+            while not getattr(self.server, "closing", False):
+                time.sleep(0.1)
+                idle += 0.1
+                mtime = marker_mtime(self.livereload_marker)
+                if mtime != last:
+                    last = mtime
+                    idle = 0.0
+                    self.wfile.write(b"data: reload\n\n")
+                    self.wfile.flush()
+                elif idle >= 15:
+                    # comment line, so closed tabs surface as a broken pipe
+                    idle = 0.0
+                    self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def marker_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    # like ThreadingHTTPServer, but connections are handled by a fixed pool
+    # of workers instead of one new thread each
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # tells long-lived handlers (live reload streams) to wind down
+        self.closing = False
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        self.closing = True
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+
+class LiveReloadHTTPServer(ThreadingHTTPServer):
+    # a thread per connection: every open live reload stream holds its
+    # connection for as long as the page stays open, and would starve a
+    # fixed pool of the workers other requests need
+    def __init__(self, server_address, handler_class):
+        self.closing = False
+        super().__init__(server_address, handler_class)
+
+    def server_close(self):
+        self.closing = True
+        super().server_close()
+
+
+def make_server(
+    server_class=None,
     handler_class=CORSHTTPRequestHandler,
     port=8000,
     directory=None,
+    livereload=False,
+    backend="threads",
+    workers=DEFAULT_WORKERS,
+    cache_control=None,
+    cache_size=0,
 ):
-    if directory:
-        os.chdir(directory)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+    directory = os.path.abspath(directory or ".")
+    options = {
+        "fingerprints": Fingerprints(os.path.join(directory, FINGERPRINTS_FILE))
+    }
+    if livereload:
+        options["livereload_marker"] = os.path.join(directory, LIVERELOAD_MARKER)
+    if cache_control is not None:
+        options["cache_control"] = cache_control
+    if cache_size:
+        options["file_cache"] = FileCache(cache_size)
+    handler_class = type(handler_class.__name__, (handler_class,), options)
+    if server_class is None:
+        if livereload:
+            server_class = LiveReloadHTTPServer
+        elif backend == "single":
+            server_class = HTTPServer
+        else:
+            server_class = functools.partial(ThreadPoolHTTPServer, workers=workers)
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
+    return server_class(
+        server_address, functools.partial(handler_class, directory=directory)
+    )
+
+
+def run(
+    server_class=None,
+    handler_class=CORSHTTPRequestHandler,
+    port=8000,
+    directory=None,
+    livereload=False,
+    backend="threads",
+    workers=DEFAULT_WORKERS,
+    cache_control=None,
+    cache_size=0,
+):
+    httpd = make_server(
+        server_class,
+        handler_class,
+        port,
+        directory,
+        livereload,
+        backend,
+        workers,
+        cache_control,
+        cache_size,
+    )
     print(f"Serving http://localhost:{port} from directory '{directory}'...")
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
 
 
 if __name__ == "__main__":
@@ -34,7 +650,45 @@ if __name__ == "__main__":
     parser.add_argument(
         "--dir", type=str, help="Directory to serve files from", default="."
     )
-    parser.add_argument("--port", type=str, help="Port to serve HTTP on", default=8888)
+    parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="threads",
+        help="threads: a bounded worker pool; single: one connection at a time",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of worker threads for the threads backend "
+        "(--livereload uses a thread per connection instead)",
+    )
+    parser.add_argument(
+        "--livereload",
+        action="store_true",
+        help=f"Serve reload notifications for watch builds at {LIVERELOAD_PATH}",
+    )
+    parser.add_argument(
+        "--cache-control",
+        default=DEFAULT_CACHE_CONTROL,
+        help="Cache-Control for files the build didn't fingerprint",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=0,
+        help="MiB of small files to keep in memory, 0 to disable; "
+        f"hit and miss counts are served at {CACHE_STATS_PATH}",
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    run(
+        port=args.port,
+        directory=args.dir,
+        livereload=args.livereload,
+        backend=args.backend,
+        workers=args.workers,
+        cache_control=args.cache_control,
+        cache_size=args.cache_size << 20,
+    )
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+
+from atomic import save_json
+from manifest import hash_file
+from publish import output_file
+from sync import copy_file, scan_files
+from template import Template
+
+
+ASSET_MANIFEST_PATH = "./.build/assets.json"
+ASSET_MANIFEST_FORMAT = 1
+FINGERPRINT_EXTENSIONS = (
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".webp",
+    ".ico",
+    ".woff",
+    ".woff2",
+)
+# the urls of every fingerprinted asset, written to the root of the output;
+# server.py serves only these as immutable
+FINGERPRINTS_FILE = ".fingerprints.json"
+FINGERPRINT_LENGTH = 8
+# root-relative src and href attributes in the template's literal text
+asset_attribute_pattern = re.compile(r"""\b(src|href)=(["'])(/[^"'#?]*)\2""")
+# JPEG start-of-frame markers carry the image size; C4, C8 and CC don't
+jpeg_frame_markers = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class AssetStats:
+    __slots__ = ("assets", "hashed", "removed", "seconds")
+
+    def __init__(self) -> None:
+        self.assets = 0
+        self.hashed = 0
+        self.removed = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"fingerprinted {self.assets} assets ({self.hashed} rehashed), "
+            f"removed {self.removed} stale, in {self.seconds * 1e3:.0f} ms"
+        )
+
+
+def fingerprinted_name(rel_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def png_size(header: bytes) -> tuple[int, int]:
+    # the IHDR chunk always comes first
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def jpeg_size(f) -> tuple[int, int]:
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # fill byte before the real marker
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in jpeg_frame_markers:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def image_size(path: str) -> tuple[int, int]:
+    # width and height from the file header alone, or None for anything
+    # that isn't a PNG or JPEG
+    with open(path, "rb") as f:
+        if path.endswith(".png"):
+            return png_size(f.read(24))
+        if path.endswith((".jpg", ".jpeg")):
+            return jpeg_size(f)
+    return None
+
+
+class AssetManifest:
+    # fingerprint and image size of every static asset, by path relative to
+    # the output; entries are reused while a file's mtime and size match
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.assets = {}
+
+    @classmethod
+    def load(cls, path: str) -> "AssetManifest":
+        manifest = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("format") == ASSET_MANIFEST_FORMAT:
+            manifest.assets = data.get("assets", {})
+        return manifest
+
+    def urls(self) -> dict[str, tuple]:
+        # root-relative url -> (fingerprinted url, width, height)
+        urls = {}
+        for rel_path, entry in self.assets.items():
+            url = "/" + rel_path.replace(os.sep, "/")
+            hashed = "/" + entry["name"].replace(os.sep, "/")
+            urls[url] = (hashed, entry["width"], entry["height"])
+        return urls
+
+    @property
+    def digest(self) -> str:
+        text = json.dumps(sorted(self.urls().items()))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def save(self) -> None:
+        data = {"format": ASSET_MANIFEST_FORMAT, "assets": self.assets}
+        save_json(self.path, data, indent=2, sort_keys=True)
+
+
+def fingerprint_assets(
+    static_dir: str, dest_dir: str, manifest: AssetManifest
+) -> AssetStats:
+    # runs after copy_files: every asset of static_dir gets a hardlinked
+    # name.<hash>.ext sibling of its copy in dest_dir, and siblings of
+    # replaced or removed assets are deleted. The plain names stay for
+    # anything linking to them directly. Only the static tree is walked, so
+    # neither the siblings nor the generated pages are ever looked at.
+    start = time.perf_counter()
+    stats = AssetStats()
+    old = manifest.assets
+    assets = {}
+    static_files = set()
+    for rel_path, entry in scan_files(static_dir):
+        static_files.add(rel_path)
+        if not entry.name.endswith(FINGERPRINT_EXTENSIONS):
+            continue
+        st = entry.stat()
+        known = old.get(rel_path)
+        if known is not None and (known["mtime_ns"], known["size"]) == (
+            st.st_mtime_ns,
+            st.st_size,
+        ):
+            assets[rel_path] = known
+        else:
+            size = image_size(entry.path)
+            assets[rel_path] = {
+                "name": fingerprinted_name(rel_path, hash_file(entry.path)),
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "width": size and size[0],
+                "height": size and size[1],
+            }
+            stats.hashed += 1
+        hashed_path = os.path.join(dest_dir, assets[rel_path]["name"])
+        if not os.path.exists(hashed_path):
+            copy_file(os.path.join(dest_dir, rel_path), hashed_path, st, link=True)
+    stats.assets = len(assets)
+
+    # a static file that happens to share an old sibling's name is kept
+    current = {entry["name"] for entry in assets.values()} | static_files
+    for name in {entry["name"] for entry in old.values()} - current:
+        path = os.path.join(dest_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+            stats.removed += 1
+    manifest.assets = assets
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def write_fingerprints(dest_dir: str, manifest: AssetManifest) -> None:
+    urls = sorted(hashed for hashed, _, _ in manifest.urls().values())
+    with output_file(os.path.join(dest_dir, FINGERPRINTS_FILE)) as f:
+        json.dump(urls, f, indent=0)
+
+
+def rewrite_template(template: Template, urls: dict[str, tuple]) -> Template:
+    # points src and href attributes in the template's own markup at the
+    # fingerprinted assets; the digest changes with them, so pages rebuild
+    def replace(match):
+        attribute, quote, url = match.groups()
+        asset = urls.get(url)
+        if asset is None:
+            return match.group(0)
+        return f"{attribute}={quote}{asset[0]}{quote}"
+
+    segments = [asset_attribute_pattern.sub(replace, s) for s in template.segments]
+    return Template(segments, list(template.slots), template.dependencies)
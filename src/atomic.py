@@ -0,0 +1,31 @@
+import contextlib
+import json
+import os
+import threading
+
+
+@contextlib.contextmanager
+def replacing(dest_path: str):
+    # yields a temporary path next to dest_path for the caller to create.
+    # On success it is renamed over dest_path, so a reader never sees a half
+    # written file and a hardlinked copy of the old one is never modified; a
+    # caller that removes it keeps dest_path as it was. On failure it is
+    # removed and dest_path is untouched.
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        if os.path.lexists(tmp_path):
+            os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_json(path: str, data, **kwargs) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with replacing(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, **kwargs)
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+
+DEFAULT_MAX_BYTES = 64 << 20
+STAMP_SECONDS = 3600
+# sqlite's limit on parameters per statement is 999 in older builds
+LOOKUP_BATCH = 500
+
+
+def current_stamp() -> int:
+    return int(time.time()) // STAMP_SECONDS
+
+
+class BlockCache:
+    # rendered html per markdown block, keyed by a hash of the block, the
+    # renderer version and any static assets the block references; new
+    # entries and last-used stamps are buffered and written in one
+    # transaction by save()
+    def __init__(
+        self,
+        path: str,
+        renderer_version: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        readonly: bool = False,
+    ) -> None:
+        self.path = path
+        self.renderer_version = renderer_version
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self.pending = {}
+        self.used = set()
+        # every stored key hit since the last save(), stamped or not
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        # recency is tracked by the hour: an entry's stamp is only rewritten
+        # when it was last used in an earlier hour, so a build that hits the
+        # same blocks as the one before it writes nothing back
+        self.stamp = current_stamp()
+        self.db = self.connect()
+
+    def connect(self):
+        if self.readonly:
+            if not os.path.exists(self.path):
+                return None
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        # the cache can always be rebuilt, so it doesn't need to be durable
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            "key BLOB PRIMARY KEY, html TEXT NOT NULL, "
+            "size INTEGER NOT NULL, used INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        return db
+
+    def key(self, block_type: str, block: str, assets: list = ()) -> bytes:
+        text = f"{self.renderer_version}\0{block_type}\0{block}"
+        if assets:
+            text += f"\0{assets!r}"
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, str]:
+        found = {key: self.pending[key] for key in keys if key in self.pending}
+        missing = list({key for key in keys if key not in found})
+        if self.db is not None:
+            for i in range(0, len(missing), LOOKUP_BATCH):
+                batch = missing[i : i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.db.execute(
+                    f"SELECT key, html, used FROM blocks WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, html, used in rows:
+                    found[key] = html
+                    self.seen.add(key)
+                    if used != self.stamp:
+                        self.used.add(key)
+        # a block repeated within the keys is only rendered once, so only
+        # its first occurrence is a miss
+        rendered = set()
+        for key in keys:
+            if key in found or key in rendered:
+                self.hits += 1
+            else:
+                rendered.add(key)
+                self.misses += 1
+        return found
+
+    def put(self, key: bytes, html: str) -> None:
+        self.pending[key] = html
+
+    def take_updates(self) -> tuple:
+        # what a worker has learned since the last call, for the process that
+        # owns the database to merge()
+        updates = (self.pending, self.used, self.seen, self.hits, self.misses)
+        self.pending, self.used, self.seen = {}, set(), set()
+        self.hits, self.misses = 0, 0
+        return updates
+
+    def merge(self, updates: tuple) -> None:
+        entries, used, seen, hits, misses = updates
+        self.pending.update(entries)
+        self.used |= used
+        self.seen |= seen
+        self.hits += hits
+        self.misses += misses
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "max_bytes": self.max_bytes,
+        }
+
+    def save(self) -> None:
+        if self.readonly or self.db is None:
+            return
+        with self.db:
+            self.db.executemany(
+                "UPDATE blocks SET used = ? WHERE key = ?",
+                ((self.stamp, key) for key in self.used),
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO blocks (key, html, size, used) "
+                "VALUES (?, ?, ?, ?)",
+                # in key order, so the b-tree is filled page by page
+                (
+                    (key, html, len(html), self.stamp)
+                    for key, html in sorted(self.pending.items())
+                ),
+            )
+            self.evict()
+        self.pending = {}
+        self.used = set()
+        self.seen = set()
+        # a long running watcher saves after every rebuild
+        self.stamp = current_stamp()
+
+    def evict(self) -> None:
+        query = "SELECT COALESCE(SUM(size), 0) FROM blocks"
+        (total,) = self.db.execute(query).fetchone()
+        if total <= self.max_bytes:
+            return
+        # entries share their hour's stamp, so within one the order is
+        # arbitrary; those hit or added since the last save go last so a
+        # build never evicts what it has just used
+        rows = self.db.execute("SELECT key, size FROM blocks ORDER BY used")
+        current = self.seen | self.pending.keys()
+        stale = []
+        for key, size in sorted(rows, key=lambda row: row[0] in current):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM blocks WHERE key = ?", stale)
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%} hit rate)"
+        )
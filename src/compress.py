@@ -0,0 +1,133 @@
+import gzip
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic import replacing
+from sync import scan_files
+
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".xml", ".json", ".txt")
+# below this the gzip header and a request's Vary bookkeeping cost more than
+# the bytes saved
+MIN_COMPRESS_SIZE = 1024
+GZIP_SUFFIX = ".gz"
+
+
+class CompressStats:
+    __slots__ = (
+        "compressed",
+        "skipped",
+        "removed",
+        "original_bytes",
+        "compressed_bytes",
+        "seconds",
+    )
+
+    def __init__(self) -> None:
+        self.compressed = 0
+        self.skipped = 0
+        self.removed = 0
+        self.original_bytes = 0
+        self.compressed_bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def ratio(self) -> float:
+        if not self.original_bytes:
+            return 1.0
+        return self.compressed_bytes / self.original_bytes
+
+    def __repr__(self) -> str:
+        return (
+            f"compressed {self.compressed} files "
+            f"({self.original_bytes} -> {self.compressed_bytes} bytes, "
+            f"ratio {self.ratio:.2f}), skipped {self.skipped}, "
+            f"removed {self.removed} stale, in {self.seconds * 1e3:.0f} ms"
+        )
+
+
+def is_compressible(path: str) -> bool:
+    return path.endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def is_precompressed(path: str, src_stat: os.stat_result) -> bool:
+    # a .gz sibling is current when it carries its source's mtime
+    try:
+        return os.stat(path + GZIP_SUFFIX).st_mtime_ns == src_stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(src: str, src_stat: os.stat_result, level: int) -> int:
+    # returns the compressed size, or -1 when the file isn't worth compressing
+    dst = src + GZIP_SUFFIX
+    with replacing(dst) as tmp:
+        with open(src, "rb") as fsrc, open(tmp, "wb") as fdst:
+            # mtime=0 keeps the output identical across builds
+            with gzip.GzipFile(
+                filename="", mode="wb", compresslevel=level, fileobj=fdst, mtime=0
+            ) as gz:
+                shutil.copyfileobj(fsrc, gz)
+        size = os.path.getsize(tmp)
+        if size >= src_stat.st_size:
+            os.remove(tmp)
+            remove_file(dst)
+            return -1
+        os.utime(tmp, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return size
+
+
+def compress_tree(root: str, jobs: int = None, level: int = 9) -> CompressStats:
+    start = time.perf_counter()
+    stats = CompressStats()
+    files = {}
+    siblings = []
+    for _, entry in scan_files(root):
+        if entry.name.endswith(GZIP_SUFFIX):
+            siblings.append(entry.path)
+        elif is_compressible(entry.name):
+            files[entry.path] = entry.stat()
+
+    # drop .gz files whose source is gone or too small to compress now
+    for path in siblings:
+        src = path.removesuffix(GZIP_SUFFIX)
+        if not is_compressible(src):
+            continue
+        src_stat = files.get(src)
+        if src_stat is None or src_stat.st_size < MIN_COMPRESS_SIZE:
+            stats.removed += remove_file(path)
+
+    to_compress = []
+    for src, src_stat in files.items():
+        if src_stat.st_size < MIN_COMPRESS_SIZE:
+            continue
+        if is_precompressed(src, src_stat):
+            stats.skipped += 1
+            continue
+        to_compress.append((src, src_stat))
+
+    # zlib releases the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        sizes = executor.map(
+            lambda item: compress_file(item[0], item[1], level), to_compress
+        )
+        for (_, src_stat), size in zip(to_compress, sizes):
+            if size < 0:
+                stats.skipped += 1
+                continue
+            stats.compressed += 1
+            stats.original_bytes += src_stat.st_size
+            stats.compressed_bytes += size
+
+    stats.seconds = time.perf_counter() - start
+    return stats
@@ -1,7 +1,52 @@
 import re
 
-from htmlnode import HTMLNode, ParentNode
-from textnode import text_to_textnodes, text_node_to_html_node
+from block_cache import BlockCache
+from htmlnode import HTMLNode, LeafNode, ParentNode, RawNode
+from textnode import referenced_assets, text_to_textnodes, text_node_to_html_node
+
+# bump whenever a change to the renderer alters the generated html, so
+# incremental builds know to re-render every page
+RENDERER_VERSION = "5"
+# longest page description, cut back to the last whole word
+DESCRIPTION_CHARS = 160
+
+
+def extract_title(markdown: str) -> str:
+    if not markdown.lstrip().startswith("# "):
+        raise ValueError("Markdown to start with heading")
+
+    match = re.match(r"^\s*#\s+(.+)", markdown)
+    if match:
+        return match.group(1).strip()
+
+    raise ValueError("Markdown doesn't contain a valid title")
+
+
+def read_head(lines) -> list[str]:
+    # the lines up to and including the first non-blank one, which is all
+    # extract_title needs, without reading the rest of a file
+    head = []
+    for line in lines:
+        head.append(line)
+        if line.strip():
+            break
+    return head
+
+
+def extract_description(lines, max_chars: int = DESCRIPTION_CHARS) -> str:
+    # plain text of the first paragraph; blocks are scanned lazily, so a file
+    # is only read up to the end of that paragraph
+    for block_type, block in scan_blocks(lines):
+        if block_type != block_type_paragraph:
+            continue
+        (text,) = block_inline_texts(block, block_type)
+        text = "".join(node.text for node in text_to_textnodes(text))
+        text = " ".join(text.split())
+        if len(text) > max_chars:
+            cut = text.rfind(" ", 0, max_chars)
+            text = text[: cut if cut > 0 else max_chars] + "…"
+        return text
+    return ""
 
 
 def markdown_to_blocks(text: str) -> list[str]:
@@ -36,7 +81,7 @@ def block_to_block_type(text: str) -> str:
 
 
 def heading_block_to_html_node(block: str) -> ParentNode:
-    match = re.match(r"^(#{1,6})\s+(.+)$", block)
+    match = heading_block_pattern.match(block)
     if match:
         count = len(match.group(1))
         text = block[count + 1 :]
@@ -45,11 +90,23 @@ def heading_block_to_html_node(block: str) -> ParentNode:
     raise ValueError(f"Invalid heading block: {text}")
 
 
+def code_block_parts(block: str) -> tuple[str, str]:
+    # (language, body) of a fenced block; a single word right after the
+    # opening fence names the language, e.g. ```python
+    text = block.strip("`")
+    first, newline, _ = text.partition("\n")
+    language = first.strip()
+    if not newline or not language or " " in language:
+        return None, text
+    return language, text[len(first) :]
+
+
 def code_block_to_html_node(block: str) -> ParentNode:
-    # wrap in pre tag
-    text = block.strip("```")
-    children = text_to_children(text)
-    code = ParentNode("code", children)
+    # the body is written verbatim and escaped, never inline-parsed, so "*"
+    # and backticks in code survive
+    language, body = code_block_parts(block)
+    props = None if language is None else {"class": f"language-{language}"}
+    code = ParentNode("code", [LeafNode(None, body)], props)
     return ParentNode("pre", [code])
 
 
@@ -96,6 +153,23 @@ def paragraph_to_html_node(block: str) -> HTMLNode:
     raise ValueError("No children in paragraph")
 
 
+def block_inline_texts(block: str, block_type: str) -> list[str]:
+    # the text each converter above hands to text_to_children (the verbatim
+    # body for code), for callers that want a block's TextNodes without
+    # building html
+    if block_type == block_type_heading:
+        return [block[len(heading_block_pattern.match(block).group(1)) + 1 :]]
+    if block_type == block_type_code:
+        return [code_block_parts(block)[1]]
+    if block_type == block_type_quote:
+        return [" ".join(line.strip("> ") for line in block.split("\n"))]
+    if block_type == block_type_ordered_list:
+        return [line[3:] for line in block.split("\n")]
+    if block_type == block_type_unordered_list:
+        return [line[2:] for line in block.split("\n")]
+    return [" ".join(block.split("\n"))]
+
+
 def text_to_children(text: str) -> [HTMLNode]:
     text_nodes = text_to_textnodes(text)
     children = []
@@ -104,17 +178,74 @@ def text_to_children(text: str) -> [HTMLNode]:
     return children
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
-    blocks = markdown_to_blocks(markdown)
+def markdown_to_html_node(
+    markdown: str, engine: str = None, cache: BlockCache = None
+) -> ParentNode:
+    blocks = block_engines[engine or default_block_engine](markdown)
+    if cache is not None:
+        return ParentNode("div", cached_block_nodes(list(blocks), cache))
     children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
+    for block_type, block in blocks:
+        html_node = block_to_html_node(block, block_type)
         children.append(html_node)
     return ParentNode("div", children)
 
 
-def block_to_html_node(block: str) -> HTMLNode:
-    block_type = block_to_block_type(block)
+def cached_block_nodes(blocks: list[tuple[str, str]], cache: BlockCache) -> list:
+    # one lookup per page; only blocks the cache hasn't seen are rendered
+    keys = [
+        cache.key(block_type, block, referenced_assets(block))
+        for block_type, block in blocks
+    ]
+    found = cache.get_many(keys)
+    children = []
+    for key, (block_type, block) in zip(keys, blocks):
+        html = found.get(key)
+        if html is None:
+            html = block_to_html_node(block, block_type).to_html()
+            cache.put(key, html)
+            found[key] = html
+        children.append(RawNode(html))
+    return children
+
+
+# with a cache, streamed blocks are looked up a batch at a time; a batch is
+# closed once it holds this many characters, so memory stays bounded by this
+# plus the largest block
+BLOCK_BATCH_CHARS = 1 << 16
+
+
+def batch_blocks(blocks, max_chars: int = BLOCK_BATCH_CHARS):
+    batch = []
+    size = 0
+    for block_type, block in blocks:
+        batch.append((block_type, block))
+        size += len(block)
+        if size >= max_chars:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+
+def write_blocks_html(blocks, write, cache: BlockCache = None) -> None:
+    # the html markdown_to_html_node(...).write_html would write, produced one
+    # block at a time from lazily read blocks instead of a whole-page tree
+    write("<div>")
+    if cache is None:
+        for block_type, block in blocks:
+            block_to_html_node(block, block_type)._write_html(write)
+    else:
+        for batch in batch_blocks(blocks):
+            for node in cached_block_nodes(batch, cache):
+                node._write_html(write)
+    write("</div>")
+
+
+def block_to_html_node(block: str, block_type: str = None) -> HTMLNode:
+    if block_type is None:
+        block_type = block_to_block_type(block)
     if block_type == block_type_paragraph:
         return paragraph_to_html_node(block)
     if block_type == block_type_heading:
@@ -130,26 +261,105 @@ def block_to_html_node(block: str) -> HTMLNode:
     raise ValueError("invalid block type")
 
 
+# the heading text starts at its first non-blank character and stops at the
+# end of the line, so no two parts of the pattern can match the same run of
+# characters and it stays linear; the multi-line block checks are plain line
+# scans rather than regexes so hostile input cannot make them backtrack
+heading_block_pattern = re.compile(r"^(#{1,6})[ \t]+(\S[^\n]*)$")
+ordered_list_item_pattern = re.compile(r"\d+\.")
+
+
+def block_lines(text: str) -> list[str]:
+    lines = text.split("\n")
+    # like a regex "$", tolerate a single trailing newline
+    if len(lines) > 1 and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
 def is_markdown_heading_block(text: str) -> bool:
-    heading_pattern = re.compile(r"^#{1,6}\s+.+$")
-    return bool(heading_pattern.match(text))
+    return bool(heading_block_pattern.match(text))
 
 
 def is_markdown_code_block(text: str) -> bool:
-    code_pattern = re.compile(r"^```[\s\S]*```$")
-    return bool(code_pattern.match(text))
+    if text.endswith("\n"):
+        text = text[:-1]
+    return len(text) >= 6 and text.startswith("```") and text.endswith("```")
 
 
 def is_markdown_quote_block(text: str) -> bool:
-    quote_pattern = re.compile(r"^(>.*(\n|$))+$")
-    return bool(quote_pattern.match(text))
+    return all(line.startswith(">") for line in block_lines(text))
 
 
 def is_markdown_unordered_list_block(text: str) -> bool:
-    unordered_list_pattern = re.compile(r"^([\*-].*(\n|$))+$")
-    return bool(unordered_list_pattern.match(text))
+    return all(line[:1] in ("*", "-") for line in block_lines(text))
 
 
 def is_markdown_ordered_list_block(text: str) -> bool:
-    ordered_list_pattern = re.compile(r"^((\d+\..*)(\n|$))+$")
-    return bool(ordered_list_pattern.match(text))
+    return all(ordered_list_item_pattern.match(line) for line in block_lines(text))
+
+
+def scan_blocks(lines):
+    # one pass over the lines, yielding (block_type, block) as each block
+    # ends. Blocks are separated by blank lines, except inside a fenced code
+    # block, and every block is classified from per-line flags collected
+    # while reading it, so nothing is re-matched against the whole block.
+    block = []
+    in_fence = False
+    quote = unordered = ordered = True
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        if in_fence:
+            block.append(line)
+            if line.rstrip().endswith("```"):
+                in_fence = False
+            continue
+        if not line.strip():
+            if block:
+                yield classify_block(block, quote, unordered, ordered)
+                block = []
+                quote = unordered = ordered = True
+            continue
+        if not block:
+            line = line.lstrip()
+            stripped = line.rstrip()
+            in_fence = stripped.startswith("```") and (
+                len(stripped) < 6 or not stripped.endswith("```")
+            )
+        block.append(line)
+        quote = quote and line.startswith(">")
+        unordered = unordered and line[:1] in ("*", "-")
+        ordered = ordered and ordered_list_item_pattern.match(line) is not None
+    if block:
+        yield classify_block(block, quote, unordered, ordered)
+
+
+def classify_block(
+    lines: list[str], quote: bool, unordered: bool, ordered: bool
+) -> tuple[str, str]:
+    text = "\n".join(lines).strip()
+    # same precedence as block_to_block_type
+    if len(lines) == 1 and heading_block_pattern.match(text):
+        return block_type_heading, text
+    if len(text) >= 6 and text.startswith("```") and text.endswith("```"):
+        return block_type_code, text
+    if quote:
+        return block_type_quote, text
+    if unordered:
+        return block_type_unordered_list, text
+    if ordered:
+        return block_type_ordered_list, text
+    return block_type_paragraph, text
+
+
+def split_blocks(markdown: str):
+    for block in markdown_to_blocks(markdown):
+        yield block_to_block_type(block), block
+
+
+block_engines = {
+    "scan": lambda markdown: scan_blocks(markdown.split("\n")),
+    "split": split_blocks,
+}
+default_block_engine = "scan"
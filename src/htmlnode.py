@@ -1,4 +1,34 @@
+# (character, entity) pairs, "&" first so entities aren't escaped twice. Each
+# is applied with str.replace only when present: on text that mostly needs no
+# escaping that beats a str.translate table, whose multi-character
+# replacements take a slow per-character path
+text_escapes = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"))
+attribute_escapes = text_escapes + (('"', "&quot;"),)
+
+
+def escape(text: str, escapes: tuple = text_escapes) -> str:
+    for char, entity in escapes:
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+
+def sink_writer(sink):
+    # html can be serialized into a list buffer, anything with a write method
+    # (io.StringIO, an open file) or a plain callable taking each fragment
+    if isinstance(sink, list):
+        return sink.append
+    write = getattr(sink, "write", None)
+    if write is not None:
+        return write
+    if callable(sink):
+        return sink
+    raise TypeError(f"Cannot write html into {type(sink).__name__}")
+
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
         self,
         tag: str = None,
@@ -12,15 +42,23 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
+        out = []
+        self._write_html(out.append)
+        return "".join(out)
+
+    def write_html(self, sink) -> None:
+        self._write_html(sink_writer(sink))
+
+    def _write_html(self, write) -> None:
         raise NotImplementedError
 
     def props_to_html(self):
-        res = ""
         if self.props is None:
-            return res
-        for prop in self.props:
-            res += f' {prop}="{self.props[prop]}"'
-        return res
+            return ""
+        return "".join(
+            f' {prop}="{escape(str(value), attribute_escapes)}"'
+            for prop, value in self.props.items()
+        )
 
     def __repr__(self) -> str:
         children_tags = ", ".join(child.tag for child in self.children)
@@ -28,6 +66,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag: str,
@@ -40,14 +80,19 @@ class LeafNode(HTMLNode):
         if self.value is None:
             raise ValueError("LeafNode must have a value")
         if self.tag is None:
-            return self.value
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+            return escape(self.value)
+        return f"<{self.tag}{self.props_to_html()}>{escape(self.value)}</{self.tag}>"
+
+    def _write_html(self, write) -> None:
+        write(self.to_html())
 
     def __repr__(self) -> str:
         return f"LeafNode(tag={self.tag}, value={self.value}, props={self.props_to_html()})"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag: str,
@@ -56,16 +101,31 @@ class ParentNode(HTMLNode):
     ) -> None:
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def _write_html(self, write) -> None:
         if self.tag is None:
             raise ValueError("ParentNode must have a tag")
         if self.children is None:
             raise ValueError("ParentNode must have children")
 
-        html = f"<{self.tag}{self.props_to_html()}>"
-
+        write(f"<{self.tag}{self.props_to_html()}>")
         for child in self.children:
-            html += child.to_html()
-        html += f"</{self.tag}>"
+            child._write_html(write)
+        write(f"</{self.tag}>")
+
+
+class RawNode(HTMLNode):
+    # html that was rendered earlier, e.g. a block from the render cache;
+    # written out verbatim
+    __slots__ = ()
 
-        return html
+    def __init__(self, html: str) -> None:
+        super().__init__(None, html, None, None)
+
+    def to_html(self):
+        return self.value
+
+    def _write_html(self, write) -> None:
+        write(self.value)
+
+    def __repr__(self) -> str:
+        return f"RawNode({self.value!r})"
@@ -1,92 +1,639 @@
+import argparse
+import cProfile
+import datetime
+import functools
+import itertools
 import os
-import shutil
-import re
-from html_markdown import markdown_to_html_node
+import pstats
+import time
+from concurrent.futures import ProcessPoolExecutor
+import textnode
+from assets import (
+    ASSET_MANIFEST_PATH,
+    FINGERPRINTS_FILE,
+    AssetManifest,
+    fingerprint_assets,
+    rewrite_template,
+    write_fingerprints,
+)
+from block_cache import DEFAULT_MAX_BYTES, BlockCache
+from compress import compress_tree
+from html_markdown import (
+    RENDERER_VERSION,
+    extract_description,
+    extract_title,
+    markdown_to_html_node,
+    read_head,
+    scan_blocks,
+    write_blocks_html,
+)
+from htmlnode import attribute_escapes, escape
+from manifest import BuildManifest, hash_bytes, hash_file
+from minify import HTMLMinifier
+from publish import STAGING_DIR, output_file, publish
+from search_index import SEARCH_DIR, SearchIndex
+from site_index import SiteIndex, page_date, write_feed, write_listing, write_sitemap
+from sync import SyncStats, sync_tree
+from telemetry import BuildTelemetry
+from template import Template, fill_slots, load_template, placeholder_pattern
 
 
-def main():
-    __location__ = "./public"
+MANIFEST_PATH = "./.build/manifest.json"
+STATIC_RECORD_PATH = "./.build/static.json"
+BLOCK_CACHE_PATH = "./.build/blocks.sqlite"
+SITE_INDEX_PATH = "./.build/site.sqlite"
+# generated from the site index, next to the pages
+LISTING_PATH = os.path.join("archive", "index.html")
+SITEMAP_PATH = "sitemap.xml"
+FEED_PATH = "feed.xml"
+# outputs the build writes itself; a page or static file at one of these
+# paths would be silently overwritten, so the build refuses to start
+GENERATED_PATHS = (LISTING_PATH, SITEMAP_PATH, FEED_PATH, FINGERPRINTS_FILE)
+GENERATED_DIRS = (SEARCH_DIR,)
 
-    if os.path.exists(__location__):
-        shutil.rmtree(__location__)
 
-    copy_files("./static", __location__)
-    generate_pages_recursive("./content", "./template.html", "./public")
+# 0 prints only the build summary, 1 adds a line per generated page and 2
+# also logs skipped pages and new directories; set by main() from -v
+verbosity = 0
 
 
-def copy_files(from_path: str, dest_path: str) -> None:
-    if not os.path.exists(dest_path):
-        print(f"creating path: {dest_path}")
-        os.mkdir(dest_path)
-    paths = os.listdir(from_path)
-    for p in paths:
-        full_path = os.path.join(from_path, p)
-        if not os.path.isfile(full_path):
-            copy_files(full_path, os.path.join(dest_path, p))
-        else:
-            print(f"copying file: {full_path}")
-            shutil.copyfile(full_path, os.path.join(dest_path, p))
+def log(level: int, message: str) -> None:
+    if verbosity >= level:
+        print(message)
 
 
-def extract_title(markdown: str) -> str:
-    if not markdown.lstrip().startswith("# "):
-        raise ValueError("Markdown to start with heading")
+def main(argv: list[str] = None):
+    global verbosity
 
-    match = re.match(r"^\s*#\s+(.+)", markdown)
-    if match:
-        return match.group(1).strip()
+    parser = argparse.ArgumentParser(description="Build the static site")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of processes rendering pages, 0 for one per CPU",
+    )
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="Hardlink static files into the output instead of copying them",
+    )
+    parser.add_argument(
+        "--no-gzip",
+        action="store_true",
+        help="Don't write precompressed .gz copies of HTML, CSS and other text",
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="count",
+        default=0,
+        help="Log every generated page, twice to also log skipped ones",
+    )
+    parser.add_argument("--report", help="Write a JSON build report to this path")
+    parser.add_argument(
+        "--top", type=int, default=10, help="Slowest pages listed in the report"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Measure peak Python memory with tracemalloc (slows the build)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Render pages in this process under cProfile and save the stats",
+    )
+    parser.add_argument(
+        "--block-cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES >> 20,
+        help="MiB of rendered blocks kept between builds, 0 to disable the cache",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Render pages block by block from the source file, for huge pages",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="http://localhost:8888",
+        help="Absolute URL the site is served from, used by the sitemap and feed",
+    )
+    parser.add_argument(
+        "--value",
+        type=template_value,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Fill {{ NAME }} on every page with VALUE, inserted as html",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Collapse whitespace and drop comments and optional quotes in pages",
+    )
+    args = parser.parse_args(argv)
+    jobs = args.jobs or os.cpu_count() or 1
+    verbosity = args.verbose
+    telemetry = BuildTelemetry(args.top, args.trace_memory)
+    telemetry.start()
 
-    raise ValueError("Markdown doesn't contain a valid title")
+    # pages and assets are built into a staging tree that persists between
+    # builds, then published to ./public in one step
+    __location__ = STAGING_DIR
 
+    with telemetry.phase("walk"):
+        pages = find_pages("./content", __location__)
+    conflicts = generated_path_conflicts(pages, __location__, "./static")
+    if conflicts:
+        raise SystemExit(
+            "error: these would be overwritten by generated outputs, move or "
+            "rename them:\n  " + "\n  ".join(conflicts)
+        )
 
-def generate_page(from_path: str, template_path: str, dest_path: str) -> None:
-    print(f"generating page from {from_path} to {dest_path} using {template_path}")
+    with telemetry.phase("assets"):
+        stats = copy_files(
+            "./static", __location__, link=args.link, record_path=STATIC_RECORD_PATH
+        )
+        asset_manifest = AssetManifest.load(ASSET_MANIFEST_PATH)
+        asset_stats = fingerprint_assets("./static", __location__, asset_manifest)
+        asset_manifest.save()
+        write_fingerprints(__location__, asset_manifest)
+    print(f"static files: {stats}")
+    print(f"assets: {asset_stats}")
 
-    with open(from_path) as md:
-        md_file = md.read()
-        md.close()
+    asset_urls = asset_manifest.urls()
+    textnode.set_asset_urls(asset_urls)
+    template = rewrite_template(load_template("./template.html"), asset_urls)
+    site_values = {"SiteUrl": args.site_url.rstrip("/"), **dict(args.value)}
+    template = fill_slots(template, site_values)
+    # pages embed fingerprinted urls and image sizes, so they can only be
+    # reused while the assets are the same; blocks are keyed on the entries
+    # they reference instead. Blocks are cached before minification, but
+    # whole pages are not
+    manifest = BuildManifest.load(
+        MANIFEST_PATH,
+        template.digest,
+        f"{RENDERER_VERSION}+{asset_manifest.digest[:16]}"
+        + ("+minify" if args.minify else ""),
+    )
+    block_cache = None
+    if args.block_cache_size:
+        block_cache = BlockCache(
+            BLOCK_CACHE_PATH, RENDERER_VERSION, args.block_cache_size << 20
+        )
+    profiler = None
+    if args.profile:
+        # workers aren't profiled, so the hot path runs here
+        profiler = cProfile.Profile()
+        jobs = 1
+        profiler.enable()
+    generate_pages_recursive(
+        "./content",
+        "./template.html",
+        __location__,
+        manifest,
+        jobs,
+        template,
+        telemetry,
+        block_cache,
+        args.stream,
+        args.minify,
+    )
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+    with telemetry.phase("manifest"):
+        for removed in manifest.prune():
+            log(1, f"removing stale page: {removed}")
+        manifest.save()
+    if block_cache is not None:
+        with telemetry.phase("block cache"):
+            block_cache.save()
+            block_cache.close()
+        telemetry.caches["blocks"] = block_cache.stats()
+        print(f"block cache: {block_cache}")
+
+    with telemetry.phase("index"):
+        site_index = SiteIndex(SITE_INDEX_PATH)
+        stats = site_index.update(pages, __location__)
+        write_site_outputs(site_index, template, __location__, args.site_url)
+    print(f"site index: {stats}")
+
+    with telemetry.phase("search"):
+        search_index = SearchIndex(site_index)
+        stats = search_index.update()
+        stats.shards = search_index.write(__location__)
+        site_index.close()
+    print(f"search index: {stats}")
+
+    if not args.no_gzip:
+        with telemetry.phase("gzip"):
+            stats = compress_tree(__location__, jobs)
+        print(f"gzip: {stats}")
+
+    with telemetry.phase("publish"):
+        stats = publish(__location__, "./public")
+    print(f"published: {stats}")
+
+    if args.minify:
+        print(f"minify: saved {telemetry.bytes_saved} bytes in generated pages")
+
+    telemetry.stop()
+    print(telemetry.summary())
+    if args.report:
+        telemetry.write(args.report)
+
+
+def template_value(text: str) -> tuple[str, str]:
+    name, _, value = text.partition("=")
+    if not placeholder_pattern.fullmatch(f"{{{{ {name} }}}}"):
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name, value
+
+
+def copy_files(
+    from_path: str,
+    dest_path: str,
+    jobs: int = None,
+    link: bool = False,
+    record_path: str = None,
+) -> SyncStats:
+    return sync_tree(from_path, dest_path, jobs, link, record_path)
+
+
+def generated_path_conflicts(
+    pages: list[tuple[str, str]], dest_dir: str, static_dir: str
+) -> list[str]:
+    # sources whose output is one of GENERATED_PATHS or lies under one of
+    # GENERATED_DIRS
+    conflicts = []
+    for source, dest in pages:
+        rel_path = os.path.relpath(dest, dest_dir)
+        if rel_path in GENERATED_PATHS or rel_path.split(os.sep)[0] in GENERATED_DIRS:
+            conflicts.append(source)
+    for rel_path in GENERATED_PATHS + GENERATED_DIRS:
+        path = os.path.join(static_dir, rel_path)
+        if os.path.exists(path):
+            conflicts.append(path)
+    return conflicts
 
-    with open(template_path) as tmp:
-        tmp_file = tmp.read()
-        tmp.close()
 
-    node = markdown_to_html_node(md_file)
-    content = node.to_html()
-    title = extract_title(md_file)
+def write_site_outputs(
+    site_index: SiteIndex, template: Template, dest_dir: str, site_url: str
+) -> None:
+    # everything here comes from the index, no source is read
+    pages = site_index.pages()
+    site_url = site_url.rstrip("/")
+    home = next((page["title"] for page in pages if page["path"] == "/"), "Feed")
+    listing = {
+        "Title": "Archive",
+        "Date": page_date(pages[0]).date().isoformat() if pages else "",
+        "Description": "",
+        "Content": lambda write: write_listing(pages, write),
+    }
+    outputs = {
+        SITEMAP_PATH: lambda write: write_sitemap(pages, write, site_url),
+        FEED_PATH: lambda write: write_feed(pages, write, site_url, home),
+        LISTING_PATH: lambda write: template.render(write, listing),
+    }
+    for rel_path, render in outputs.items():
+        path = os.path.join(dest_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with output_file(path) as f:
+            render(f.write)
+
+
+def source_values(source_path: str, template: Template) -> dict:
+    # per-page values besides Title and Content, only worked out for the
+    # slots the template has
+    values = {}
+    if "Date" in template.slots:
+        mtime = os.stat(source_path).st_mtime
+        date = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+        values["Date"] = date.date().isoformat()
+    if "Description" in template.slots:
+        with open(source_path) as md:
+            values["Description"] = escape(extract_description(md), attribute_escapes)
+    return values
+
+
+def page_values(
+    md_file: str, block_cache: BlockCache = None, values: dict = None
+) -> dict:
+    node = markdown_to_html_node(md_file, cache=block_cache)
+    return {
+        **(values or {}),
+        "Title": escape(extract_title(md_file)),
+        "Content": node.write_html,
+    }
+
+
+def render_page(md_file: str, template: Template) -> str:
+    return template.render_to_string(page_values(md_file))
 
-    tmp_file = tmp_file.replace("{{ Title }}", title)
-    tmp_file = tmp_file.replace("{{ Content }}", content)
 
+def write_page(
+    md_file: str,
+    template: Template,
+    dest_path: str,
+    block_cache: BlockCache = None,
+    minify: bool = False,
+    values: dict = None,
+) -> tuple[float, float, float, int, int]:
+    # returns seconds spent parsing, rendering and writing, the page size and
+    # the bytes minification saved
+    start = time.perf_counter()
+    values = page_values(md_file, block_cache, values)
+    parsed = time.perf_counter()
+
+    # the page streams into the output file as it renders, so it is never
+    # held whole; time inside write calls is counted as writing, and
+    # minifying as rendering
     os.makedirs(os.path.split(dest_path)[0], exist_ok=True)
+    writing = 0.0
+    with output_file(dest_path) as html_file:
 
-    with open(dest_path, "w+") as html_file:
-        html_file.write(tmp_file)
-        html_file.close()
+        def write(fragment: str) -> None:
+            nonlocal writing
+            before = time.perf_counter()
+            html_file.write(fragment)
+            writing += time.perf_counter() - before
 
+        minifier = None
+        if minify:
+            minifier = HTMLMinifier(write)
+            write = minifier.write
+        template.render(write, values)
+        if minifier is not None:
+            minifier.close()
+        rendered = time.perf_counter()
+    written = time.perf_counter()
+    size = os.path.getsize(dest_path)
+    saved = 0 if minifier is None else minifier.saved
+    render = rendered - parsed - writing
+    return parsed - start, render, written - rendered + writing, size, saved
 
-def generate_pages_recursive(
-    dir_path_content: str, template_path: str, dest_dir_path: str
+
+def stream_page(
+    source_path: str,
+    template: Template,
+    dest_path: str,
+    block_cache: BlockCache = None,
+    minify: bool = False,
+    values: dict = None,
+) -> tuple[float, float, float, int, int]:
+    # renders straight from the source file handle into the output file, so
+    # only the current block (or batch of blocks with a cache) is in memory;
+    # parsing, rendering and writing interleave and are timed as rendering
+    start = time.perf_counter()
+    os.makedirs(os.path.split(dest_path)[0], exist_ok=True)
+    with open(source_path) as md, output_file(dest_path) as html_file:
+        head = read_head(md)
+        values = {
+            **(values or {}),
+            "Title": escape(extract_title("".join(head))),
+            "Content": lambda write: write_blocks_html(
+                scan_blocks(itertools.chain(head, md)), write, block_cache
+            ),
+        }
+        write = html_file.write
+        minifier = None
+        if minify:
+            minifier = HTMLMinifier(write)
+            write = minifier.write
+        template.render(write, values)
+        if minifier is not None:
+            minifier.close()
+    size = os.path.getsize(dest_path)
+    saved = 0 if minifier is None else minifier.saved
+    return 0.0, time.perf_counter() - start, 0.0, size, saved
+
+
+def read_source(from_path: str) -> tuple[str, str]:
+    with open(from_path, "rb") as md:
+        md_bytes = md.read()
+        md.close()
+    return md_bytes.decode(), hash_bytes(md_bytes)
+
+
+def generate_page(
+    from_path: str,
+    template_path: str,
+    dest_path: str,
+    manifest: BuildManifest = None,
+    template: Template = None,
+    telemetry: BuildTelemetry = None,
+    block_cache: BlockCache = None,
+    stream: bool = False,
+    minify: bool = False,
 ) -> None:
+    if stream:
+        md_file, source_hash = from_path, hash_file(from_path)
+    else:
+        md_file, source_hash = read_source(from_path)
+    if manifest is not None and manifest.is_fresh(from_path, dest_path, source_hash):
+        log(2, f"skipping unchanged page {from_path}")
+        if telemetry is not None:
+            telemetry.record_skip()
+        return
+
+    log(1, f"generating page from {from_path} to {dest_path} using {template_path}")
+    if template is None:
+        template = load_template(template_path)
+    render = stream_page if stream else write_page
+    values = source_values(from_path, template)
+    timing = render(md_file, template, dest_path, block_cache, minify, values)
+
+    if manifest is not None:
+        manifest.record(from_path, dest_path, source_hash)
+    if telemetry is not None:
+        telemetry.record_page(from_path, os.path.getsize(from_path), timing)
+
+
+def walk_pages(dir_path_content: str, dest_dir_path: str):
+    # iterative os.scandir walk yielding (source, dest) in the same depth
+    # first, directory listing order the recursive walk used
     if not os.path.exists(dest_dir_path):
-        print(f"creating path: {dest_dir_path}")
-
-    paths = os.listdir(dir_path_content)
-    for p in paths:
-        full_path = os.path.join(dir_path_content, p)
-        if not os.path.isfile(full_path):
-            generate_pages_recursive(
-                full_path, template_path, os.path.join(dest_dir_path, p)
+        log(2, f"creating path: {dest_dir_path}")
+    stack = [(os.scandir(dir_path_content), dest_dir_path)]
+    try:
+        while stack:
+            entries, dest_dir = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                entries.close()
+                stack.pop()
+                continue
+            if not entry.is_file():
+                sub_dest = os.path.join(dest_dir, entry.name)
+                if not os.path.exists(sub_dest):
+                    log(2, f"creating path: {sub_dest}")
+                stack.append((os.scandir(entry.path), sub_dest))
+                continue
+            file_name, file_extension = os.path.splitext(entry.name)
+            if file_extension == ".md":
+                yield entry.path, os.path.join(dest_dir, f"{file_name}.html")
+    finally:
+        for entries, _ in stack:
+            entries.close()
+
+
+def find_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    return list(walk_pages(dir_path_content, dest_dir_path))
+
+
+def generate_pages_recursive(
+    dir_path_content: str,
+    template_path: str,
+    dest_dir_path: str,
+    manifest: BuildManifest = None,
+    jobs: int = 1,
+    template: Template = None,
+    telemetry: BuildTelemetry = None,
+    block_cache: BlockCache = None,
+    stream: bool = False,
+    minify: bool = False,
+) -> None:
+    if telemetry is None:
+        telemetry = BuildTelemetry()
+    if template is None:
+        template = load_template(template_path)
+    if stream and jobs == 1:
+        # pages are rendered as the walk finds them, so its time is part of
+        # the pages phase
+        pages = walk_pages(dir_path_content, dest_dir_path)
+    else:
+        with telemetry.phase("walk"):
+            pages = find_pages(dir_path_content, dest_dir_path)
+    with telemetry.phase("pages"):
+        if jobs > 1:
+            generate_pages_parallel(
+                pages,
+                template_path,
+                template,
+                manifest,
+                jobs,
+                telemetry,
+                block_cache,
+                stream,
+                minify,
             )
-        head, tail = os.path.split(full_path)
-        file_name, file_extension = os.path.splitext(tail)
-        if file_extension == ".md":
-            print(f"generating markdown: {full_path}")
+            return
+
+        for full_path, dest_path in pages:
+            log(2, f"generating markdown: {full_path}")
             generate_page(
                 full_path,
                 template_path,
-                os.path.join(dest_dir_path, f"{file_name}.html"),
+                dest_path,
+                manifest,
+                template,
+                telemetry,
+                block_cache,
+                stream,
+                minify,
             )
 
 
+def generate_pages_parallel(
+    pages: list[tuple[str, str]],
+    template_path: str,
+    template: Template,
+    manifest: BuildManifest,
+    jobs: int,
+    telemetry: BuildTelemetry = None,
+    block_cache: BlockCache = None,
+    stream: bool = False,
+    minify: bool = False,
+) -> None:
+    # freshness checks and manifest updates stay in this process; only the
+    # rendering is fanned out, and results are consumed in walk order so the
+    # log reads exactly like a serial build. When streaming, workers get the
+    # source path rather than its contents.
+    pending = []
+    for full_path, dest_path in pages:
+        if stream:
+            md_file, source_hash = full_path, hash_file(full_path)
+        else:
+            md_file, source_hash = read_source(full_path)
+        if manifest is not None and manifest.is_fresh(
+            full_path, dest_path, source_hash
+        ):
+            pending.append((full_path, dest_path, None, None))
+            continue
+        pending.append((full_path, dest_path, md_file, source_hash))
+
+    to_render = [page for page in pending if page[2] is not None]
+    render = functools.partial(stream_page if stream else write_page, minify=minify)
+    render = functools.partial(write_worker_page, render)
+    initargs = (textnode.asset_urls, None, None)
+    if block_cache is not None:
+        initargs = (
+            textnode.asset_urls,
+            block_cache.path,
+            block_cache.renderer_version,
+        )
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker, initargs=initargs
+    ) as executor:
+        results = executor.map(
+            render,
+            [page[2] for page in to_render],
+            [template] * len(to_render),
+            [page[1] for page in to_render],
+            [source_values(page[0], template) for page in to_render],
+            chunksize=max(1, len(to_render) // (jobs * 4)),
+        )
+        for full_path, dest_path, md_file, source_hash in pending:
+            log(2, f"generating markdown: {full_path}")
+            if md_file is None:
+                log(2, f"skipping unchanged page {full_path}")
+                if telemetry is not None:
+                    telemetry.record_skip()
+                continue
+            timing = next(results)
+            if block_cache is not None:
+                timing, updates = timing
+                block_cache.merge(updates)
+            log(
+                1,
+                f"generating page from {full_path} to {dest_path} "
+                f"using {template_path}",
+            )
+            if manifest is not None:
+                manifest.record(full_path, dest_path, source_hash)
+            if telemetry is not None:
+                telemetry.record_page(full_path, os.path.getsize(full_path), timing)
+
+
+# each worker reads the block cache through its own read-only connection;
+# the blocks it renders go back to the parent, which owns the database
+worker_block_cache = None
+
+
+def init_worker(
+    asset_urls: dict, block_cache_path: str, renderer_version: str
+) -> None:
+    # workers started with spawn don't inherit the parent's globals
+    global worker_block_cache
+    textnode.set_asset_urls(asset_urls)
+    if block_cache_path is not None:
+        worker_block_cache = BlockCache(
+            block_cache_path, renderer_version, readonly=True
+        )
+
+
+def write_worker_page(
+    render, page: str, template: Template, dest_path: str, values: dict
+) -> tuple:
+    timing = render(page, template, dest_path, worker_block_cache, values=values)
+    if worker_block_cache is None:
+        return timing
+    return timing, worker_block_cache.take_updates()
+
+
 if __name__ == "__main__":
     main()
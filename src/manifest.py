@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+
+from atomic import save_json
+
+
+MANIFEST_FORMAT = 1
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path: str, template_hash: str, renderer_version: str) -> None:
+        self.path = path
+        self.template_hash = template_hash
+        self.renderer_version = renderer_version
+        self.pages = {}
+        self.seen = set()
+        self.invalidated = True
+
+    @classmethod
+    def load(
+        cls, path: str, template_hash: str, renderer_version: str
+    ) -> "BuildManifest":
+        manifest = cls(path, template_hash, renderer_version)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("format") != MANIFEST_FORMAT:
+            return manifest
+        manifest.pages = data.get("pages", {})
+        # a different template or renderer means every page has to be rebuilt,
+        # but the old entries are kept so removed sources can still be pruned
+        manifest.invalidated = (
+            data.get("template") != template_hash
+            or data.get("renderer") != renderer_version
+        )
+        return manifest
+
+    def is_fresh(self, source: str, dest: str, source_hash: str) -> bool:
+        source = os.path.normpath(source)
+        self.seen.add(source)
+        if self.invalidated:
+            return False
+        entry = self.pages.get(source)
+        if entry is None:
+            return False
+        if entry["hash"] != source_hash or entry["dest"] != os.path.normpath(dest):
+            return False
+        return os.path.exists(dest)
+
+    def record(self, source: str, dest: str, source_hash: str) -> None:
+        source = os.path.normpath(source)
+        self.seen.add(source)
+        self.pages[source] = {"hash": source_hash, "dest": os.path.normpath(dest)}
+
+    def prune(self) -> list[str]:
+        removed = []
+        for source in sorted(set(self.pages) - self.seen):
+            dest = self.pages.pop(source)["dest"]
+            if os.path.exists(dest):
+                os.remove(dest)
+                removed.append(dest)
+        return removed
+
+    def save(self) -> None:
+        data = {
+            "format": MANIFEST_FORMAT,
+            "template": self.template_hash,
+            "renderer": self.renderer_version,
+            "pages": self.pages,
+        }
+        save_json(self.path, data, indent=2, sort_keys=True)
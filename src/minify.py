@@ -0,0 +1,182 @@
+import re
+
+
+# fragments are gathered until there is this much text, so the per-call
+# overhead is paid per chunk rather than per rendered node
+CHUNK_SIZE = 1 << 14
+WHITESPACE = " \t\n\r\f"
+# whitespace next to these is never rendered, so it is dropped rather than
+# collapsed to one space
+BLOCK_TAGS = frozenset(
+    (
+        "!doctype html head body title meta link script style base "
+        "article section header footer nav main aside div p ul ol li dl dt dd "
+        "h1 h2 h3 h4 h5 h6 blockquote pre table thead tbody tfoot tr td th "
+        "hr br figure figcaption form fieldset details summary"
+    ).split()
+)
+# contents are passed through untouched up to the matching closing tag
+RAW_TAGS = frozenset(("pre", "code", "textarea", "script", "style"))
+
+whitespace_pattern = re.compile(r"[ \t\n\r\f]+")
+tag_pattern = re.compile(
+    r"""<(/?)([A-Za-z][A-Za-z0-9-]*)((?:"[^"]*"|'[^']*'|[^'">])*)>"""
+)
+attribute_pattern = re.compile(
+    r"""([^\s"'=<>/]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?"""
+)
+unquoted_value_pattern = re.compile(r"""[^\s"'=<>`]+""")
+
+
+def minify_attributes(attributes: str) -> str:
+    # one space before each attribute, and no quotes where html allows it;
+    # a self-closing slash keeps every quote so it can't join a value
+    attributes = attributes.strip(WHITESPACE)
+    self_closing = attributes.endswith("/")
+    out = []
+    for name, value in attribute_pattern.findall(attributes):
+        if not value:
+            out.append(f" {name}")
+            continue
+        if value[0] in "\"'" and not self_closing:
+            inner = value[1:-1]
+            if unquoted_value_pattern.fullmatch(inner) and not inner.endswith("/"):
+                value = inner
+        out.append(f" {name}={value}")
+    if self_closing:
+        out.append("/")
+    return "".join(out)
+
+
+class HTMLMinifier:
+    # a write() that minifies html on its way to another write(). Fragments
+    # may split tags, comments and text anywhere; an unfinished construct at
+    # the end of a chunk is carried over to the next one. close() flushes.
+    def __init__(self, write) -> None:
+        self.out = write
+        self.buffer = []
+        self.buffered = 0
+        self.pending = ""
+        # closing tag being waited for while inside pre, code and the like
+        self.raw = None
+        # whitespace seen but not written yet, and whether the last thing
+        # written was a block tag, together decide if it becomes a space
+        self.space = False
+        self.after_block = True
+        self.chars_in = 0
+        self.chars_out = 0
+
+    @property
+    def saved(self) -> int:
+        # everything dropped is ascii, so characters saved are bytes saved
+        return self.chars_in - self.chars_out
+
+    def write(self, fragment: str) -> None:
+        self.buffer.append(fragment)
+        self.buffered += len(fragment)
+        self.chars_in += len(fragment)
+        if self.buffered >= CHUNK_SIZE:
+            self.flush(final=False)
+
+    def close(self) -> None:
+        self.flush(final=True)
+
+    def emit(self, text: str) -> None:
+        self.chars_out += len(text)
+        self.out(text)
+
+    def flush_space(self, block: bool) -> None:
+        if self.space and not self.after_block and not block:
+            self.emit(" ")
+        self.space = False
+
+    def text(self, text: str) -> None:
+        stripped = text.strip(WHITESPACE)
+        if not stripped:
+            self.space = self.space or bool(text)
+            return
+        if text[0] in WHITESPACE:
+            self.space = True
+        self.flush_space(block=False)
+        self.emit(whitespace_pattern.sub(" ", stripped))
+        self.after_block = False
+        self.space = text[-1] in WHITESPACE
+
+    def flush(self, final: bool) -> None:
+        text = self.pending + "".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.pending = ""
+        pos = 0
+        length = len(text)
+        while pos < length:
+            if self.raw is not None:
+                closing = f"</{self.raw}"
+                end = text.find(closing, pos)
+                if end == -1:
+                    # hold back what could be the start of the closing tag
+                    keep = 0 if final else len(closing) - 1
+                    end = max(pos, length - keep)
+                    self.emit(text[pos:end])
+                    pos = end
+                    break
+                self.emit(text[pos:end])
+                self.after_block = False
+                self.raw = None
+                pos = end
+
+            start = text.find("<", pos)
+            if start == -1:
+                self.text(text[pos:])
+                pos = length
+                break
+            self.text(text[pos:start])
+            pos = start
+
+            if text.startswith("<!--", pos):
+                end = text.find("-->", pos + 4)
+                if end == -1:
+                    break
+                if text.startswith("[if", pos + 4):
+                    # conditional comments are markup to old browsers
+                    self.flush_space(block=True)
+                    self.emit(text[pos : end + 3])
+                pos = end + 3
+                continue
+            if text.startswith(("<!", "<?"), pos):
+                end = text.find(">", pos)
+                if end == -1:
+                    break
+                self.flush_space(block=True)
+                self.emit(whitespace_pattern.sub(" ", text[pos : end + 1]))
+                self.after_block = True
+                pos = end + 1
+                continue
+
+            match = tag_pattern.match(text, pos)
+            if match is None:
+                if text.find(">", pos) == -1 and not final:
+                    # possibly a tag cut off at the end of the chunk
+                    break
+                # a "<" that doesn't open a tag is text
+                end = text.find("<", pos + 1)
+                end = length if end == -1 else end
+                self.text(text[pos:end])
+                pos = end
+                continue
+            closing, name, attributes = match.groups()
+            lower = name.lower()
+            block = lower in BLOCK_TAGS
+            self.flush_space(block)
+            self.emit(f"<{closing}{name}{minify_attributes(attributes)}>")
+            self.after_block = block
+            if not closing and lower in RAW_TAGS and not attributes.endswith("/"):
+                self.raw = lower
+            pos = match.end()
+
+        if pos < length:
+            if final:
+                # an unterminated tag or comment is written as it came
+                self.emit(text[pos:])
+            else:
+                self.pending = text[pos:]
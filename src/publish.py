@@ -0,0 +1,124 @@
+import contextlib
+import os
+import shutil
+import time
+
+from atomic import replacing
+from sync import scan_files
+
+
+STAGING_DIR = "./.build/staging"
+GENERATIONS_DIR = "./.build/generations"
+
+
+class PublishStats:
+    __slots__ = ("files", "generation", "removed", "seconds")
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.generation = None
+        self.removed = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"linked {self.files} files into {self.generation}, "
+            f"removed {self.removed} old generations, in {self.seconds * 1e3:.0f} ms"
+        )
+
+
+def same_contents(path: str, other: str) -> bool:
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+        with open(path, "rb") as f, open(other, "rb") as g:
+            while True:
+                chunk = f.read(1 << 16)
+                if chunk != g.read(1 << 16):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
+
+
+@contextlib.contextmanager
+def output_file(dest_path: str, mode: str = "w"):
+    # yields a temporary file next to dest_path that replaces it on success.
+    # When the bytes didn't change the old file, and its mtime, are kept so
+    # deploys and the gzip step only see real changes. Outputs are never
+    # written in place, so a hardlinked published copy is never modified.
+    with replacing(dest_path) as tmp_path:
+        with open(tmp_path, mode) as f:
+            yield f
+        if same_contents(tmp_path, dest_path):
+            os.remove(tmp_path)
+
+
+def snapshot_tree(src: str, dst: str) -> int:
+    # hardlinks every file of src into dst, which costs a directory entry per
+    # file rather than a copy of its bytes
+    os.makedirs(dst)
+    made = {dst}
+    files = 0
+    for rel_path, entry in scan_files(src):
+        if entry.name.endswith(".tmp"):
+            continue
+        target = os.path.join(dst, rel_path)
+        directory = os.path.dirname(target)
+        if directory not in made:
+            os.makedirs(directory, exist_ok=True)
+            made.add(directory)
+        try:
+            os.link(entry.path, target)
+        except OSError:
+            # filesystems without hardlinks
+            shutil.copy2(entry.path, target)
+        files += 1
+    return files
+
+
+def link_target(link_path: str) -> str:
+    if not os.path.islink(link_path):
+        return None
+    target = os.readlink(link_path)
+    return os.path.normpath(os.path.join(os.path.dirname(link_path), target))
+
+
+def swap_link(link_path: str, target: str) -> None:
+    # a symlink renamed over another is replaced atomically, so every request
+    # sees either the whole old site or the whole new one
+    relative = os.path.relpath(target, os.path.dirname(os.path.abspath(link_path)))
+    with replacing(link_path) as tmp_path:
+        os.symlink(relative, tmp_path)
+
+
+def publish(
+    staging_dir: str, public_dir: str, generations_dir: str = GENERATIONS_DIR
+) -> PublishStats:
+    start = time.perf_counter()
+    stats = PublishStats()
+    generation = os.path.join(generations_dir, f"{time.time_ns():020d}")
+    stats.generation = generation
+    stats.files = snapshot_tree(staging_dir, generation)
+
+    previous = link_target(public_dir)
+    if previous is None and os.path.isdir(public_dir):
+        # a plain directory from a build before publishing was atomic; this
+        # one rename leaves public_dir missing until the link below is made
+        previous = os.path.join(generations_dir, f"{time.time_ns():020d}.old")
+        os.rename(public_dir, previous)
+    swap_link(public_dir, generation)
+
+    # the generation just replaced is kept so requests already reading it
+    # can finish; anything older goes
+    keep = {os.path.basename(generation)}
+    if previous is not None:
+        keep.add(os.path.basename(previous))
+    for name in os.listdir(generations_dir):
+        if name not in keep:
+            shutil.rmtree(os.path.join(generations_dir, name))
+            stats.removed += 1
+
+    stats.seconds = time.perf_counter() - start
+    return stats
@@ -0,0 +1,235 @@
+import collections
+import itertools
+import json
+import os
+import re
+import time
+
+from html_markdown import (
+    block_inline_texts,
+    block_type_code,
+    extract_title,
+    read_head,
+    scan_blocks,
+)
+from publish import output_file
+from site_index import SiteIndex
+from textnode import text_to_textnodes
+
+
+# shards live under this directory of the output, one per term prefix, next
+# to docs.json which maps document ids to their url and title
+SEARCH_DIR = "search"
+PREFIX_LENGTH = 2
+# a term in the title counts as this many occurrences in the body
+TITLE_WEIGHT = 5
+token_pattern = re.compile(r"\w+")
+
+
+class SearchStats:
+    __slots__ = ("indexed", "unchanged", "removed", "shards", "seconds")
+
+    def __init__(self) -> None:
+        self.indexed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.shards = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"indexed {self.indexed} pages, {self.unchanged} unchanged, "
+            f"removed {self.removed}, wrote {self.shards} shards, "
+            f"in {self.seconds * 1e3:.0f} ms"
+        )
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in token_pattern.findall(text.lower()) if len(token) > 1]
+
+
+def shard_name(term: str) -> str:
+    # readable names for plain ascii prefixes, hex for anything a file name
+    # or url might trip over
+    prefix = term[:PREFIX_LENGTH]
+    if prefix.isascii() and prefix.isalnum():
+        return prefix
+    return "_" + prefix.encode().hex()
+
+
+def page_terms(source: str) -> tuple[str, collections.Counter]:
+    # term counts from the TextNodes of every block, read a block at a time
+    counts = collections.Counter()
+    with open(source) as md:
+        head = read_head(md)
+        title = extract_title("".join(head))
+        for term in tokenize(title):
+            counts[term] += TITLE_WEIGHT
+        for block_type, block in scan_blocks(itertools.chain(head, md)):
+            for text in block_inline_texts(block, block_type):
+                if block_type == block_type_code:
+                    counts.update(tokenize(text))
+                    continue
+                for node in text_to_textnodes(text):
+                    counts.update(tokenize(node.text))
+    return title, counts
+
+
+class SearchIndex:
+    # postings of every page, kept in the site index's database next to its
+    # pages table. A page is re-indexed when its row there differs from the
+    # one it was indexed from, and only the shards its old and new terms
+    # fall in are rewritten
+    def __init__(self, site_index: SiteIndex) -> None:
+        self.site_index = site_index
+        self.db = site_index.db
+        self.dirty = set()
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id INTEGER PRIMARY KEY, source TEXT UNIQUE NOT NULL, "
+            "path TEXT NOT NULL, title TEXT NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, shard TEXT NOT NULL, "
+            "doc INTEGER NOT NULL, count INTEGER NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS postings_shard ON postings (shard)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)")
+
+    def drop_postings(self, doc: int) -> None:
+        rows = self.db.execute(
+            "SELECT DISTINCT shard FROM postings WHERE doc = ?", (doc,)
+        )
+        self.dirty.update(shard for shard, in rows)
+        self.db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+
+    def update(self) -> SearchStats:
+        # runs after SiteIndex.update, whose rows say which sources exist and
+        # what they looked like when last scanned
+        start = time.perf_counter()
+        stats = SearchStats()
+        changed = self.db.execute(
+            "SELECT pages.source, pages.path, pages.mtime_ns, pages.size, docs.id "
+            "FROM pages LEFT JOIN docs ON docs.source = pages.source "
+            "WHERE docs.id IS NULL OR docs.path != pages.path "
+            "OR docs.mtime_ns != pages.mtime_ns OR docs.size != pages.size"
+        ).fetchall()
+        removed = self.db.execute(
+            "SELECT id FROM docs WHERE source NOT IN (SELECT source FROM pages)"
+        ).fetchall()
+        (total,) = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()
+        stats.unchanged = total - len(changed)
+        with self.db:
+            for source, path, mtime_ns, size, doc in changed:
+                title, counts = page_terms(source)
+                if doc is None:
+                    doc = self.db.execute(
+                        "INSERT INTO docs (source, path, title, mtime_ns, size) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (source, path, title, mtime_ns, size),
+                    ).lastrowid
+                else:
+                    self.drop_postings(doc)
+                    self.db.execute(
+                        "UPDATE docs SET path = ?, title = ?, mtime_ns = ?, size = ? "
+                        "WHERE id = ?",
+                        (path, title, mtime_ns, size, doc),
+                    )
+                rows = [
+                    (term, shard_name(term), doc, count)
+                    for term, count in counts.items()
+                ]
+                self.db.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", rows)
+                self.dirty.update(shard for _, shard, _, _ in rows)
+                stats.indexed += 1
+            for (doc,) in removed:
+                self.drop_postings(doc)
+                self.db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+                stats.removed += 1
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def write(self, dest_dir: str) -> int:
+        # writes docs.json and the shards touched since the last write, plus
+        # any a fresh output directory is missing; returns the shards written
+        directory = os.path.join(dest_dir, SEARCH_DIR)
+        os.makedirs(directory, exist_ok=True)
+        rows = self.db.execute("SELECT DISTINCT shard FROM postings")
+        shards = {shard for shard, in rows}
+        existing = {
+            name[: -len(".json")]
+            for name in os.listdir(directory)
+            if name.endswith(".json") and name != "docs.json"
+        }
+        # shards that lost their last term are removed
+        for shard in existing - shards:
+            os.remove(os.path.join(directory, f"{shard}.json"))
+        to_write = (self.dirty & shards) | (shards - existing)
+        for shard in sorted(to_write):
+            with output_file(os.path.join(directory, f"{shard}.json")) as f:
+                json.dump(self.shard(shard), f, separators=(",", ":"))
+
+        docs = {
+            doc: [path, title]
+            for doc, path, title in self.db.execute(
+                "SELECT id, path, title FROM docs ORDER BY id"
+            )
+        }
+        with output_file(os.path.join(directory, "docs.json")) as f:
+            json.dump(
+                {"prefix_length": PREFIX_LENGTH, "docs": docs},
+                f,
+                separators=(",", ":"),
+            )
+        self.dirty = set()
+        return len(to_write)
+
+    def shard(self, shard: str) -> dict[str, list[int]]:
+        # term -> flat [doc, count, doc, count, ...]
+        postings = {}
+        rows = self.db.execute(
+            "SELECT term, doc, count FROM postings WHERE shard = ? ORDER BY term, doc",
+            (shard,),
+        )
+        for term, doc, count in rows:
+            postings.setdefault(term, []).extend((doc, count))
+        return postings
+
+    def __repr__(self) -> str:
+        count = self.db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return f"SearchIndex({self.site_index.path!r}, {count} pages)"
+
+
+def search(directory: str, query: str, shards: dict = None) -> list[tuple]:
+    # what a browser client does: load only the shards the query's terms
+    # fall in, keep pages that contain every term and rank them by count.
+    # shards caches loaded shards, and docs.json, across queries.
+    if shards is None:
+        shards = {}
+    scores = None
+    for term in set(tokenize(query)):
+        name = shard_name(term)
+        if name not in shards:
+            try:
+                with open(os.path.join(directory, f"{name}.json")) as f:
+                    shards[name] = json.load(f)
+            except FileNotFoundError:
+                shards[name] = {}
+        postings = shards[name].get(term, [])
+        found = dict(zip(postings[::2], postings[1::2]))
+        if scores is None:
+            scores = found
+        else:
+            scores = {doc: scores[doc] + found[doc] for doc in scores if doc in found}
+    if not scores:
+        return []
+    # shard names are at most PREFIX_LENGTH characters or start with "_", so
+    # "docs" can't clash with one
+    if "docs" not in shards:
+        with open(os.path.join(directory, "docs.json")) as f:
+            shards["docs"] = json.load(f)["docs"]
+    docs = shards["docs"]
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [tuple(docs[str(doc)]) for doc, _ in ranked]
@@ -0,0 +1,191 @@
+import datetime
+import email.utils
+import html
+import os
+import re
+import sqlite3
+import time
+
+from html_markdown import extract_title, read_head
+from textnode import extract_markdown_links, inline_image_pattern
+
+
+# entries in feed.xml, newest first
+FEED_ITEMS = 20
+word_pattern = re.compile(r"\w[\w'’-]*")
+link_target_pattern = re.compile(r"\]\([^()]*\)")
+
+
+class IndexStats:
+    __slots__ = ("scanned", "unchanged", "removed", "seconds")
+
+    def __init__(self) -> None:
+        self.scanned = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"scanned {self.scanned} pages, {self.unchanged} unchanged, "
+            f"removed {self.removed}, in {self.seconds * 1e3:.0f} ms"
+        )
+
+
+def url_path(rel_dest: str) -> str:
+    path = "/" + rel_dest.replace(os.sep, "/")
+    if path.endswith("/index.html"):
+        return path[: -len("index.html")]
+    return path
+
+
+def scan_source(source: str) -> tuple[str, int, list[str]]:
+    # the title comes from the first non-blank line; the rest of the file is
+    # read a line at a time for its word count and outbound links
+    words = 0
+    links = []
+    with open(source) as md:
+        title = extract_title("".join(read_head(md)))
+        in_fence = False
+        for line in md:
+            if line.lstrip().startswith("```"):
+                in_fence = not in_fence
+                continue
+            if in_fence:
+                continue
+            line = inline_image_pattern.sub("", line)
+            links.extend(url for _, url in extract_markdown_links(line))
+            words += len(word_pattern.findall(link_target_pattern.sub("]", line)))
+    return title, words, links
+
+
+class SiteIndex:
+    # title, url, source mtime, word count and outbound links of every page,
+    # kept between builds so listings, the sitemap and the feed never have to
+    # re-read sources that didn't change
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = self.connect()
+
+    def connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.row_factory = sqlite3.Row
+        # the index can always be rebuilt, so it doesn't need to be durable
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "source TEXT PRIMARY KEY, path TEXT NOT NULL, title TEXT NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "words INTEGER NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS links (source TEXT NOT NULL, url TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS links_source ON links (source)")
+        return db
+
+    def update(self, pages, root: str) -> IndexStats:
+        # pages are (source, dest) pairs from the walk; a source is only read
+        # when its mtime, size or output path differs from what is stored
+        start = time.perf_counter()
+        stats = IndexStats()
+        known = {
+            row["source"]: (row["mtime_ns"], row["size"], row["path"])
+            for row in self.db.execute("SELECT source, mtime_ns, size, path FROM pages")
+        }
+        seen = set()
+        with self.db:
+            for source, dest in pages:
+                source = os.path.normpath(source)
+                seen.add(source)
+                st = os.stat(source)
+                path = url_path(os.path.relpath(dest, root))
+                if known.get(source) == (st.st_mtime_ns, st.st_size, path):
+                    stats.unchanged += 1
+                    continue
+                title, words, links = scan_source(source)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, path, title, st.st_mtime_ns, st.st_size, words),
+                )
+                self.db.execute("DELETE FROM links WHERE source = ?", (source,))
+                self.db.executemany(
+                    "INSERT INTO links VALUES (?, ?)", [(source, url) for url in links]
+                )
+                stats.scanned += 1
+            for source in known.keys() - seen:
+                self.db.execute("DELETE FROM pages WHERE source = ?", (source,))
+                self.db.execute("DELETE FROM links WHERE source = ?", (source,))
+                stats.removed += 1
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def pages(self) -> list[sqlite3.Row]:
+        # newest first, then by path so equal mtimes still sort the same
+        return self.db.execute(
+            "SELECT * FROM pages ORDER BY mtime_ns DESC, path"
+        ).fetchall()
+
+    def links(self, source: str) -> list[str]:
+        rows = self.db.execute(
+            "SELECT url FROM links WHERE source = ?", (os.path.normpath(source),)
+        )
+        return [row["url"] for row in rows]
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __repr__(self) -> str:
+        count = self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return f"SiteIndex({self.path!r}, {count} pages)"
+
+
+def page_date(page: sqlite3.Row) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(
+        page["mtime_ns"] / 1e9, datetime.timezone.utc
+    )
+
+
+def write_sitemap(pages, write, site_url: str) -> None:
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for page in sorted(pages, key=lambda page: page["path"]):
+        loc = html.escape(site_url + page["path"])
+        lastmod = page_date(page).date().isoformat()
+        write(f"<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>\n")
+    write("</urlset>\n")
+
+
+def write_feed(pages, write, site_url: str, title: str, items: int = FEED_ITEMS):
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write('<rss version="2.0"><channel>\n')
+    write(f"<title>{html.escape(title)}</title>\n")
+    write(f"<link>{html.escape(site_url)}/</link>\n")
+    write(f"<description>{html.escape(title)}</description>\n")
+    for page in pages[:items]:
+        link = html.escape(site_url + page["path"])
+        date = email.utils.format_datetime(page_date(page), usegmt=True)
+        write(
+            f"<item><title>{html.escape(page['title'])}</title>"
+            f"<link>{link}</link><guid>{link}</guid>"
+            f"<pubDate>{date}</pubDate></item>\n"
+        )
+    write("</channel></rss>\n")
+
+
+def write_listing(pages, write) -> None:
+    write("<ul>")
+    for page in pages:
+        date = page_date(page).date().isoformat()
+        write(
+            f'<li><a href="{html.escape(page["path"])}">'
+            f"{html.escape(page['title'])}</a> "
+            f"<time>{date}</time> {page['words']} words</li>"
+        )
+    write("</ul>")
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from atomic import replacing, save_json
+from manifest import hash_file
+
+
+class SyncStats:
+    __slots__ = (
+        "copied",
+        "copied_bytes",
+        "skipped",
+        "skipped_bytes",
+        "removed",
+    )
+
+    def __init__(self) -> None:
+        self.copied = 0
+        self.copied_bytes = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        self.removed = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"copied {self.copied} files ({self.copied_bytes} bytes), "
+            f"skipped {self.skipped} files ({self.skipped_bytes} bytes), "
+            f"removed {self.removed} stale files"
+        )
+
+
+def scan_files(root: str):
+    # iterative os.scandir walk yielding (relative path, DirEntry) for files
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    yield rel_path, entry
+
+
+def is_unchanged(src: str, dst: str, src_stat: os.stat_result) -> bool:
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+        return True
+    # same size but a different mtime (e.g. a fresh checkout): compare the
+    # bytes once and adopt the source mtime so the next sync is stat-only
+    if hash_file(src) != hash_file(dst):
+        return False
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def copy_data(src: str, dst: str) -> None:
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+            return
+        except OSError:
+            # cross-device copies and some filesystems don't support it
+            pass
+    shutil.copyfile(src, dst)
+
+
+def copy_file(src: str, dst: str, src_stat: os.stat_result, link: bool) -> None:
+    with replacing(dst) as tmp:
+        if link:
+            try:
+                os.link(src, tmp)
+            except OSError:
+                link = False
+        if not link:
+            copy_data(src, tmp)
+            shutil.copymode(src, tmp)
+            os.utime(tmp, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def load_record(record_path: str) -> list[str]:
+    if record_path is None or not os.path.exists(record_path):
+        return []
+    try:
+        with open(record_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_record(record_path: str, files: list[str]) -> None:
+    save_json(record_path, sorted(files), indent=2)
+
+
+def remove_stale(dest_path: str, stale: list[str]) -> int:
+    removed = 0
+    for rel_path in stale:
+        path = os.path.join(dest_path, rel_path)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+        # drop directories left empty, but never the destination itself
+        directory = os.path.dirname(rel_path)
+        while directory:
+            try:
+                os.rmdir(os.path.join(dest_path, directory))
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def sync_file(src: str, dst: str, src_stat: os.stat_result, link: bool) -> bool:
+    if is_unchanged(src, dst, src_stat):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    copy_file(src, dst, src_stat, link)
+    return True
+
+
+def sync_tree(
+    from_path: str,
+    dest_path: str,
+    jobs: int = None,
+    link: bool = False,
+    record_path: str = None,
+) -> SyncStats:
+    stats = SyncStats()
+    files = [
+        (rel_path, entry.path, entry.stat())
+        for rel_path, entry in scan_files(from_path)
+    ]
+    os.makedirs(dest_path, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                sync_file, src, os.path.join(dest_path, rel_path), src_stat, link
+            )
+            for rel_path, src, src_stat in files
+        ]
+        for future, (_, _, src_stat) in zip(futures, files):
+            if future.result():
+                stats.copied += 1
+                stats.copied_bytes += src_stat.st_size
+            else:
+                stats.skipped += 1
+                stats.skipped_bytes += src_stat.st_size
+
+    # only files an earlier sync put there are stale; pages and other outputs
+    # sharing the destination are left alone
+    if record_path is not None:
+        synced = [rel_path for rel_path, _, _ in files]
+        stale = sorted(set(load_record(record_path)) - set(synced))
+        stats.removed = remove_stale(dest_path, stale)
+        save_record(record_path, synced)
+    return stats
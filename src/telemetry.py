@@ -0,0 +1,109 @@
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class BuildTelemetry:
+    def __init__(self, top: int = 10, trace_memory: bool = False) -> None:
+        self.top = top
+        self.trace_memory = trace_memory
+        # wall time of each build phase, in the order they first ran
+        self.phases = {}
+        # time spent on each page, summed across pages (and across workers
+        # when rendering in parallel, so it can exceed the wall time)
+        self.page_stages = {"parse": 0.0, "render": 0.0, "write": 0.0}
+        self.pages = []
+        self.skipped = 0
+        # bytes the minifier removed from generated pages
+        self.bytes_saved = 0
+        # hit/miss counters of caches used by the build, by name
+        self.caches = {}
+        self.started = None
+        self.finished = None
+
+    def start(self) -> None:
+        if self.trace_memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def record_page(self, source: str, source_bytes: int, timing) -> None:
+        parse, render, write, output_bytes, saved = timing
+        self.bytes_saved += saved
+        self.page_stages["parse"] += parse
+        self.page_stages["render"] += render
+        self.page_stages["write"] += write
+        self.pages.append(
+            (parse + render + write, source, source_bytes, output_bytes)
+        )
+
+    def record_skip(self) -> None:
+        self.skipped += 1
+
+    def peak_memory(self) -> dict:
+        peak = {"tracemalloc_bytes": None, "max_rss_bytes": None}
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak["tracemalloc_bytes"] = tracemalloc.get_traced_memory()[1]
+        if resource is not None:
+            # kilobytes on Linux, bytes on macOS
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak["max_rss_bytes"] = rss if os.uname().sysname == "Darwin" else rss << 10
+        return peak
+
+    def report(self) -> dict:
+        finished = self.finished or time.perf_counter()
+        slowest = sorted(self.pages, reverse=True)[: self.top]
+        return {
+            "total_seconds": finished - self.started,
+            "phases": self.phases,
+            "page_stages": self.page_stages,
+            "pages": {"generated": len(self.pages), "skipped": self.skipped},
+            "slowest_pages": [
+                {
+                    "source": source,
+                    "seconds": seconds,
+                    "source_bytes": source_bytes,
+                    "output_bytes": output_bytes,
+                }
+                for seconds, source, source_bytes, output_bytes in slowest
+            ],
+            "caches": self.caches,
+            "minify_bytes_saved": self.bytes_saved,
+            "peak_memory": self.peak_memory(),
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        phases = ", ".join(
+            f"{name} {seconds * 1e3:.0f} ms" for name, seconds in self.phases.items()
+        )
+        return (
+            f"built {report['pages']['generated']} pages "
+            f"({report['pages']['skipped']} unchanged) in "
+            f"{report['total_seconds'] * 1e3:.0f} ms: {phases}"
+        )
+
+    def write(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
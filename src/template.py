@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+
+
+# {{ Name }} is a slot filled per render, {{> file.html }} includes a partial
+# relative to the including template
+placeholder_pattern = re.compile(r"{{\s*(>)?\s*([\w./-]+)\s*}}")
+
+
+class Template:
+    def __init__(
+        self, segments: list[str], slots: list[str], dependencies: tuple = ()
+    ) -> None:
+        # segments[i] is written before slots[i]; the final segment follows
+        # the last slot, so there is always one more segment than slots
+        if len(segments) != len(slots) + 1:
+            raise ValueError("Template needs exactly one more segment than slots")
+        self.segments = segments
+        self.slots = slots
+        # files the template was compiled from: itself and every partial
+        self.dependencies = dependencies
+        self.digest = hashlib.sha256(
+            "\0".join(segments + ["\1"] + slots).encode()
+        ).hexdigest()
+
+    def render(self, write, values: dict) -> None:
+        segments = self.segments
+        for i, slot in enumerate(self.slots):
+            write(segments[i])
+            value = values.get(slot)
+            if value is None:
+                # unknown placeholders are left in the page untouched
+                write("{{ " + slot + " }}")
+            elif callable(value):
+                # streamed values write their own fragments, e.g. a node's
+                # write_html, so the page body is never built as one string
+                value(write)
+            else:
+                write(value)
+        write(segments[-1])
+
+    def render_to_string(self, values: dict) -> str:
+        out = []
+        self.render(out.append, values)
+        return "".join(out)
+
+    def __repr__(self) -> str:
+        return f"Template(slots={self.slots})"
+
+
+def compile_template(text: str, base_dir: str = ".", _including=()) -> Template:
+    segments = []
+    slots = []
+    literal = []
+    dependencies = list(_including[-1:])
+    pos = 0
+    for match in placeholder_pattern.finditer(text):
+        literal.append(text[pos : match.start()])
+        pos = match.end()
+        is_partial, name = match.groups()
+        if not is_partial:
+            segments.append("".join(literal))
+            slots.append(name)
+            literal = []
+            continue
+
+        partial_path = os.path.normpath(os.path.join(base_dir, name))
+        if partial_path in _including:
+            raise ValueError(f"Recursive partial include: {partial_path}")
+        with open(partial_path) as f:
+            partial = compile_template(
+                f.read(),
+                os.path.dirname(partial_path),
+                _including + (partial_path,),
+            )
+        dependencies.extend(partial.dependencies)
+        # splice the partial in, merging its edge literals with ours
+        literal.append(partial.segments[0])
+        for segment, slot in zip(partial.segments[1:], partial.slots):
+            segments.append("".join(literal))
+            slots.append(slot)
+            literal = [segment]
+    literal.append(text[pos:])
+    segments.append("".join(literal))
+    return Template(segments, slots, tuple(dict.fromkeys(dependencies)))
+
+
+def inject_before(template: Template, marker: str, snippet: str) -> Template:
+    # insert snippet ahead of the last occurrence of marker in the literal
+    # text, or at the very end when the template doesn't contain it
+    segments = list(template.segments)
+    for i in range(len(segments) - 1, -1, -1):
+        index = segments[i].rfind(marker)
+        if index != -1:
+            segments[i] = segments[i][:index] + snippet + segments[i][index:]
+            break
+    else:
+        segments[-1] += snippet
+    return Template(segments, list(template.slots), template.dependencies)
+
+
+def fill_slots(template: Template, values: dict) -> Template:
+    # writes values that are the same on every page, such as site-wide
+    # settings, into the literal text; the digest changes with them
+    segments = [template.segments[0]]
+    slots = []
+    for slot, segment in zip(template.slots, template.segments[1:]):
+        if slot in values:
+            segments[-1] += values[slot] + segment
+        else:
+            slots.append(slot)
+            segments.append(segment)
+    return Template(segments, slots, template.dependencies)
+
+
+def load_template(template_path: str) -> Template:
+    with open(template_path) as tmp:
+        tmp_file = tmp.read()
+        tmp.close()
+    path = os.path.normpath(template_path)
+    return compile_template(tmp_file, os.path.dirname(path), (path,))
@@ -0,0 +1,153 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+from assets import (
+    FINGERPRINTS_FILE,
+    AssetManifest,
+    fingerprint_assets,
+    fingerprinted_name,
+    image_size,
+    rewrite_template,
+    write_fingerprints,
+)
+from template import compile_template
+
+
+def png(width, height):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", 13)
+        + b"IHDR"
+        + struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    )
+
+
+def jpeg(width, height):
+    # SOI, an APP0 segment to skip, then a baseline frame header
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    frame = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + bytes(3)
+    return b"\xff\xd8" + app0 + frame
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def size_of(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_png(self):
+        self.assertEqual(self.size_of("a.png", png(1344, 896)), (1344, 896))
+
+    def test_jpeg(self):
+        self.assertEqual(self.size_of("a.jpg", jpeg(800, 600)), (800, 600))
+
+    def test_unknown(self):
+        self.assertIsNone(self.size_of("a.png", b"not a png at all, really"))
+        self.assertIsNone(self.size_of("a.jpeg", b"\xff\xd8\xff"))
+        self.assertIsNone(self.size_of("a.css", b"body {}"))
+
+
+class TestFingerprintAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest_path = os.path.join(self.tmp.name, ".build", "assets.json")
+        self.write("index.css", b"body {}")
+        self.write(os.path.join("images", "a.png"), png(64, 32))
+        self.write("index.html", b"<p>not an asset</p>")
+
+    def write(self, rel_path, data):
+        # into the static tree, and its synced copy in the output
+        for root in (self.static, self.public):
+            path = os.path.join(root, rel_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        st = os.stat(os.path.join(self.static, rel_path))
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def fingerprint(self):
+        manifest = AssetManifest.load(self.manifest_path)
+        stats = fingerprint_assets(self.static, self.public, manifest)
+        manifest.save()
+        return stats, manifest.urls()
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(
+            fingerprinted_name(os.path.join("css", "index.css"), "3f9a1c0b2d"),
+            os.path.join("css", "index.3f9a1c0b.css"),
+        )
+
+    def test_assets_get_hashed_siblings(self):
+        stats, urls = self.fingerprint()
+        self.assertEqual((stats.assets, stats.hashed), (2, 2))
+        self.assertEqual(sorted(urls), ["/images/a.png", "/index.css"])
+        url, width, height = urls["/images/a.png"]
+        self.assertRegex(url, r"^/images/a\.[0-9a-f]{8}\.png$")
+        self.assertEqual((width, height), (64, 32))
+        self.assertEqual(urls["/index.css"][1:], (None, None))
+        with open(os.path.join(self.public, urls["/index.css"][0][1:]), "rb") as f:
+            self.assertEqual(f.read(), b"body {}")
+
+    def test_unchanged_assets_are_not_rehashed(self):
+        _, urls = self.fingerprint()
+        stats, again = self.fingerprint()
+        self.assertEqual((stats.assets, stats.hashed), (2, 0))
+        self.assertEqual(urls, again)
+
+    def test_changed_asset_replaces_its_sibling(self):
+        _, urls = self.fingerprint()
+        self.write("index.css", b"body { color: red }")
+        stats, again = self.fingerprint()
+        self.assertEqual((stats.hashed, stats.removed), (1, 1))
+        self.assertNotEqual(urls["/index.css"], again["/index.css"])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.public, urls["/index.css"][0][1:]))
+        )
+        self.assertEqual(urls["/images/a.png"], again["/images/a.png"])
+
+    def test_names_that_look_hashed_are_assets(self):
+        self.write(os.path.join("images", "trip.20230515.png"), png(8, 4))
+        stats, urls = self.fingerprint()
+        self.assertEqual(stats.assets, 3)
+        url, width, height = urls["/images/trip.20230515.png"]
+        self.assertRegex(url, r"^/images/trip\.20230515\.[0-9a-f]{8}\.png$")
+        self.assertEqual((width, height), (8, 4))
+        # and the siblings made for them aren't assets on the next build
+        stats, again = self.fingerprint()
+        self.assertEqual((stats.assets, stats.hashed, stats.removed), (3, 0, 0))
+        self.assertEqual(urls, again)
+
+    def test_write_fingerprints(self):
+        _, urls = self.fingerprint()
+        write_fingerprints(self.public, AssetManifest.load(self.manifest_path))
+        with open(os.path.join(self.public, FINGERPRINTS_FILE)) as f:
+            self.assertEqual(json.load(f), sorted(url for url, _, _ in urls.values()))
+
+    def test_rewrite_template(self):
+        _, urls = self.fingerprint()
+        template = compile_template(
+            '<link href="/index.css"><a href="/about/">{{ Content }}</a>'
+            "<img src='/images/a.png'>"
+        )
+        rewritten = rewrite_template(template, urls)
+        self.assertEqual(
+            rewritten.render_to_string({"Content": "x"}),
+            f'<link href="{urls["/index.css"][0]}"><a href="/about/">x</a>'
+            f"<img src='{urls['/images/a.png'][0]}'>",
+        )
+        self.assertNotEqual(rewritten.digest, template.digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+from atomic import replacing, save_json
+
+
+class TestReplacing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "out.txt")
+        self.write(self.path, "old")
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_replaces_on_success(self):
+        with replacing(self.path) as tmp_path:
+            self.write(tmp_path, "new")
+            self.assertEqual(self.read(), "old")
+        self.assertEqual(self.read(), "new")
+        self.assertEqual(os.listdir(self.tmp.name), ["out.txt"])
+
+    def test_failure_keeps_old_file(self):
+        with self.assertRaises(RuntimeError):
+            with replacing(self.path) as tmp_path:
+                self.write(tmp_path, "half")
+                raise RuntimeError
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(self.tmp.name), ["out.txt"])
+
+    def test_removed_temporary_keeps_old_file(self):
+        with replacing(self.path) as tmp_path:
+            self.write(tmp_path, "same")
+            os.remove(tmp_path)
+        self.assertEqual(self.read(), "old")
+
+    def test_hardlinked_copy_is_not_modified(self):
+        link = os.path.join(self.tmp.name, "link.txt")
+        os.link(self.path, link)
+        with replacing(self.path) as tmp_path:
+            self.write(tmp_path, "new")
+        with open(link) as f:
+            self.assertEqual(f.read(), "old")
+
+    def test_save_json(self):
+        path = os.path.join(self.tmp.name, ".build", "data.json")
+        save_json(path, {"b": 1, "a": [2]}, sort_keys=True)
+        with open(path) as f:
+            self.assertEqual(json.load(f), {"a": [2], "b": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+from block_cache import BlockCache
+from html_markdown import markdown_to_html_node
+from textnode import set_asset_urls
+
+
+MARKDOWN = "# Title\n\nSome **bold** text\n\n* one\n* two\n\nSome **bold** text"
+
+
+class TestBlockCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, ".build", "blocks.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, version="1", **kwargs):
+        cache = BlockCache(self.path, version, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_cached_render_matches_uncached(self):
+        expected = markdown_to_html_node(MARKDOWN).to_html()
+        cache = self.open()
+        html = markdown_to_html_node(MARKDOWN, cache=cache).to_html()
+        self.assertEqual(html, expected)
+        # the repeated paragraph is only rendered once
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        cache.save()
+        html = markdown_to_html_node(MARKDOWN, cache=cache).to_html()
+        self.assertEqual(html, expected)
+        self.assertEqual(cache.hits, 5)
+
+    def test_entries_persist(self):
+        cache = self.open()
+        markdown_to_html_node(MARKDOWN, cache=cache)
+        cache.save()
+        cache.close()
+        cache = self.open()
+        markdown_to_html_node(MARKDOWN + "\n\nnew", cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+        self.assertEqual(cache.hit_rate, 0.8)
+
+    def test_renderer_version_is_part_of_the_key(self):
+        cache = self.open()
+        markdown_to_html_node(MARKDOWN, cache=cache)
+        cache.save()
+        cache = self.open(version="2")
+        markdown_to_html_node(MARKDOWN, cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_asset_change_only_misses_blocks_referencing_it(self):
+        self.addCleanup(set_asset_urls, {})
+        markdown = MARKDOWN + "\n\n![a](/a.png)\n\n[b](/b.css)"
+        css = ("/b.1.css", None, None)
+        set_asset_urls({"/a.png": ("/a.1.png", 1, 1), "/b.css": css})
+        cache = self.open()
+        markdown_to_html_node(markdown, cache=cache)
+        cache.save()
+        set_asset_urls({"/a.png": ("/a.2.png", 1, 1), "/b.css": css})
+        cache = self.open()
+        html = markdown_to_html_node(markdown, cache=cache).to_html()
+        self.assertEqual((cache.hits, cache.misses), (5, 1))
+        self.assertIn('src="/a.2.png"', html)
+
+    def test_render_errors_are_not_cached(self):
+        cache = self.open()
+        with self.assertRaises(ValueError):
+            markdown_to_html_node("# ok\n\n`broken", cache=cache)
+        self.assertEqual(len(cache.pending), 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.open(max_bytes=20)
+        for i, html in enumerate(["a" * 8, "b" * 8]):
+            cache.stamp = i
+            cache.put(cache.key("paragraph", str(i)), html)
+            cache.save()
+        cache.stamp = 2
+        cache.get_many([cache.key("paragraph", "0")])
+        cache.put(cache.key("paragraph", "2"), "c" * 8)
+        cache.save()
+        keys = [cache.key("paragraph", str(i)) for i in range(3)]
+        self.assertEqual(
+            set(cache.get_many(keys)), {cache.key("paragraph", "0"), keys[2]}
+        )
+
+    def test_entries_used_this_build_are_evicted_last(self):
+        cache = self.open(max_bytes=20)
+        old = sorted(cache.key("paragraph", str(i)) for i in range(2))
+        for key in old:
+            cache.put(key, "a" * 8)
+        cache.stamp = 1
+        cache.save()
+        # the next build runs within the same hour, so every entry has the
+        # same stamp
+        cache.stamp = 1
+        cache.get_many([old[0]])
+        new = cache.key("paragraph", "2")
+        cache.put(new, "c" * 8)
+        cache.save()
+        self.assertEqual(set(cache.get_many(old + [new])), {old[0], new})
+
+    def test_readonly_worker_updates(self):
+        cache = self.open()
+        markdown_to_html_node(MARKDOWN, cache=cache)
+        cache.save()
+        worker = self.open(readonly=True)
+        markdown_to_html_node(MARKDOWN + "\n\nnew", cache=worker)
+        updates = worker.take_updates()
+        self.assertEqual((worker.hits, worker.misses, worker.pending), (0, 0, {}))
+        worker.save()
+        cache.merge(updates)
+        cache.save()
+        cache = self.open()
+        markdown_to_html_node("new", cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_readonly_without_database(self):
+        cache = self.open(readonly=True)
+        markdown_to_html_node(MARKDOWN, cache=cache)
+        cache.save()
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
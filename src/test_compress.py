@@ -0,0 +1,80 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import MIN_COMPRESS_SIZE, compress_tree
+
+
+PAGE = "<p>" + "static site " * 200 + "</p>"
+
+
+class TestCompressTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.page = self.write("post/index.html", PAGE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        return path
+
+    def test_writes_gzip_siblings(self):
+        stats = compress_tree(self.root)
+        self.assertEqual(stats.compressed, 1)
+        self.assertLess(stats.ratio, 0.5)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), PAGE)
+        self.assertEqual(
+            os.stat(self.page + ".gz").st_mtime_ns, os.stat(self.page).st_mtime_ns
+        )
+
+    def test_output_is_deterministic(self):
+        compress_tree(self.root)
+        with open(self.page + ".gz", "rb") as f:
+            first = f.read()
+        os.remove(self.page + ".gz")
+        compress_tree(self.root)
+        with open(self.page + ".gz", "rb") as f:
+            self.assertEqual(f.read(), first)
+
+    def test_skips_small_binary_and_incompressible_files(self):
+        self.write("small.css", "body {}")
+        self.write("image.png", PAGE)
+        self.write("random.js", os.urandom(MIN_COMPRESS_SIZE * 4))
+        stats = compress_tree(self.root)
+        self.assertEqual(stats.compressed, 1)
+        for name in ["small.css", "image.png", "random.js"]:
+            self.assertFalse(os.path.exists(os.path.join(self.root, name + ".gz")))
+
+    def test_unchanged_files_are_skipped(self):
+        compress_tree(self.root)
+        stats = compress_tree(self.root)
+        self.assertEqual((stats.compressed, stats.skipped), (0, 1))
+
+    def test_changed_file_is_recompressed(self):
+        compress_tree(self.root)
+        self.write("post/index.html", PAGE * 2)
+        os.utime(self.page, ns=(1, 1))
+        self.assertEqual(compress_tree(self.root).compressed, 1)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), PAGE * 2)
+
+    def test_stale_siblings_are_removed(self):
+        compress_tree(self.root)
+        archive = self.write("archive.tar.gz", b"not ours")
+        os.remove(self.page)
+        stats = compress_tree(self.root)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertTrue(os.path.exists(archive))
+
+
+if __name__ == "__main__":
+    unittest.main()
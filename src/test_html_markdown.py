@@ -1,6 +1,17 @@
+import re
 import unittest
 
-from html_markdown import markdown_to_blocks
+from html_markdown import (
+    block_to_block_type,
+    extract_description,
+    is_markdown_code_block,
+    is_markdown_ordered_list_block,
+    is_markdown_quote_block,
+    is_markdown_unordered_list_block,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    scan_blocks,
+)
 
 
 class TestMarkdownToBlocks(unittest.TestCase):
@@ -48,5 +59,157 @@ class TestMarkdownToBlocks(unittest.TestCase):
         self.assertEqual(markdown_to_blocks(text), expected_output)
 
 
+class TestScanBlocks(unittest.TestCase):
+    document = "\n".join(
+        [
+            "# Title",
+            "",
+            "Some *text* here",
+            "over two lines",
+            "",
+            "",
+            "> quote one",
+            "> quote two",
+            "",
+            "* item",
+            "- item",
+            "",
+            "1. first",
+            "2. second",
+            "",
+            "```",
+            "code",
+            "```",
+            "",
+            "## Heading",
+            "# not a heading block",
+            "",
+            "  indented paragraph  ",
+            "",
+        ]
+    )
+
+    def test_matches_split_engine(self):
+        split = [
+            (block_to_block_type(block), block)
+            for block in markdown_to_blocks(self.document)
+        ]
+        self.assertEqual(list(scan_blocks(self.document.split("\n"))), split)
+
+    def test_accepts_lines_with_newlines(self):
+        lines = self.document.splitlines(keepends=True)
+        self.assertEqual(
+            list(scan_blocks(lines)), list(scan_blocks(self.document.split("\n")))
+        )
+
+    def test_block_types(self):
+        types = [block_type for block_type, _ in scan_blocks(self.document.split("\n"))]
+        self.assertEqual(
+            types,
+            [
+                "heading",
+                "paragraph",
+                "quote",
+                "unordered_list",
+                "ordered_list",
+                "code",
+                "paragraph",
+                "paragraph",
+            ],
+        )
+
+    def test_fenced_code_keeps_blank_lines(self):
+        markdown = "intro\n\n```\nfirst\n\n\nsecond\n```\n\nafter"
+        blocks = list(scan_blocks(markdown.split("\n")))
+        self.assertEqual(
+            blocks,
+            [
+                ("paragraph", "intro"),
+                ("code", "```\nfirst\n\n\nsecond\n```"),
+                ("paragraph", "after"),
+            ],
+        )
+
+    def test_single_line_fence(self):
+        blocks = list(scan_blocks(["```inline```", "", "next"]))
+        self.assertEqual(blocks, [("code", "```inline```"), ("paragraph", "next")])
+
+    def test_engines_render_the_same_html(self):
+        self.assertEqual(
+            markdown_to_html_node(self.document, engine="scan").to_html(),
+            markdown_to_html_node(self.document, engine="split").to_html(),
+        )
+
+    def test_fenced_code_renders_as_one_pre(self):
+        html = markdown_to_html_node("```\na\n\nb\n```").to_html()
+        self.assertEqual(html, "<div><pre><code>\na\n\nb\n</code></pre></div>")
+
+    def test_fenced_code_is_verbatim(self):
+        md = "```\ndef f(*args, **kw):\n    return `x` if a < b && c else 0\n```"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><pre><code>\ndef f(*args, **kw):\n"
+            "    return `x` if a &lt; b &amp;&amp; c else 0\n</code></pre></div>",
+        )
+
+    def test_fenced_code_language(self):
+        html = markdown_to_html_node("```python\nprint(1)\n```").to_html()
+        self.assertEqual(
+            html,
+            '<div><pre><code class="language-python">\nprint(1)\n</code></pre></div>',
+        )
+
+
+class TestExtractDescription(unittest.TestCase):
+    def test_first_paragraph_as_plain_text(self):
+        lines = ["# Title\n", "\n", "## Intro\n", "\n", "Some **bold**\n", "[a](/a)\n"]
+        self.assertEqual(extract_description(lines), "Some bold a")
+
+    def test_cut_at_word(self):
+        lines = ["# Title", "", "one two three four"]
+        self.assertEqual(extract_description(lines, 12), "one two…")
+
+    def test_no_paragraph(self):
+        self.assertEqual(extract_description(["# Title", "", "* item"]), "")
+
+
+class TestBlockChecks(unittest.TestCase):
+    # the regexes the line-based checks replaced
+    regexes = [
+        (is_markdown_code_block, re.compile(r"^```[\s\S]*```$")),
+        (is_markdown_quote_block, re.compile(r"^(>.*(\n|$))+$")),
+        (is_markdown_unordered_list_block, re.compile(r"^([\*-].*(\n|$))+$")),
+        (is_markdown_ordered_list_block, re.compile(r"^((\d+\..*)(\n|$))+$")),
+    ]
+    samples = [
+        "",
+        "```",
+        "``````",
+        "```\ncode\n```",
+        "```\ncode\n```\n",
+        "```\ncode\n``` trailing",
+        "> a",
+        "> a\n> b",
+        "> a\nb",
+        "> a\n",
+        ">",
+        "* a\n- b",
+        "* a\nb",
+        "-",
+        "1. a\n2. b",
+        "1. a\n2 b",
+        "12.a",
+        "1.\n",
+        "plain text",
+    ]
+
+    def test_match_previous_regexes(self):
+        for check, regex in self.regexes:
+            for sample in self.samples:
+                with self.subTest(check=check.__name__, sample=sample):
+                    self.assertEqual(check(sample), bool(regex.match(sample)))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,8 @@
+import io
+import os
+import tempfile
 import unittest
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, attribute_escapes, escape
 
 class TestHTMLNode(unittest.TestCase):
     def test_init(self):
@@ -36,6 +39,10 @@ class TestHTMLNode(unittest.TestCase):
         with self.assertRaises(NotImplementedError):
             node.to_html()
 
+    def test_slots(self):
+        for node in [HTMLNode(), LeafNode(tag='p', value='Hello'), ParentNode(tag='div', children=[])]:
+            self.assertFalse(hasattr(node, '__dict__'))
+
 class TestLeafNode(unittest.TestCase):
     def test_init_valid(self):
         node = LeafNode(tag='p', value='Hello', props={'class': 'text'})
@@ -130,5 +137,74 @@ class TestParentNode(unittest.TestCase):
         self.assertEqual(parent2.to_html(), expected_output)
 
 
+class TestWriteHTML(unittest.TestCase):
+    def setUp(self):
+        self.node = ParentNode(tag='div', children=[
+            LeafNode(tag='b', value='bold'),
+            ParentNode(tag='ul', children=[LeafNode(tag='li', value='item')]),
+            LeafNode(tag=None, value='text'),
+        ], props={'class': 'parent'})
+        self.expected = '<div class="parent"><b>bold</b><ul><li>item</li></ul>text</div>'
+
+    def test_to_html(self):
+        self.assertEqual(self.node.to_html(), self.expected)
+
+    def test_write_to_list(self):
+        out = []
+        self.node.write_html(out)
+        self.assertGreater(len(out), 1)
+        self.assertEqual(''.join(out), self.expected)
+
+    def test_write_to_stringio(self):
+        out = io.StringIO()
+        self.node.write_html(out)
+        self.assertEqual(out.getvalue(), self.expected)
+
+    def test_write_to_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'out.html')
+            with open(path, 'w') as f:
+                self.node.write_html(f)
+            with open(path) as f:
+                self.assertEqual(f.read(), self.expected)
+
+    def test_write_to_callable(self):
+        out = []
+        self.node.write_html(out.append)
+        self.assertEqual(''.join(out), self.expected)
+
+    def test_write_to_invalid_sink(self):
+        with self.assertRaises(TypeError):
+            self.node.write_html(42)
+
+    def test_deeply_nested(self):
+        node = LeafNode(tag='li', value='leaf')
+        for _ in range(500):
+            node = ParentNode(tag='ul', children=[node])
+        html = node.to_html()
+        self.assertEqual(len(html), 500 * len('<ul></ul>') + len('<li>leaf</li>'))
+
+    def test_base_node_write_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            HTMLNode().write_html([])
+
+
+class TestEscape(unittest.TestCase):
+    def test_escape_text(self):
+        self.assertEqual(escape('a < b && c > "d"'), 'a &lt; b &amp;&amp; c &gt; "d"')
+
+    def test_escape_attribute(self):
+        self.assertEqual(escape('say "hi" & go', attribute_escapes), 'say &quot;hi&quot; &amp; go')
+
+    def test_escape_plain_text_unchanged(self):
+        text = 'nothing to escape here'
+        self.assertIs(escape(text), text)
+
+    def test_leaf_and_props_escaped(self):
+        node = LeafNode(tag='a', value='<b>', props={'title': 'x"y<z'})
+        self.assertEqual(node.to_html(), '<a title="x&quot;y&lt;z">&lt;b&gt;</a>')
+        self.assertEqual(LeafNode(tag=None, value='a&b').to_html(), 'a&amp;b')
+
+
 if __name__ == '__main__':
     unittest.main()
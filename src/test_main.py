@@ -0,0 +1,272 @@
+import contextlib
+import io
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import main
+from html_markdown import markdown_to_html_node
+from main import find_pages, generate_pages_recursive, stream_page, write_page
+from telemetry import BuildTelemetry
+from template import compile_template
+
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as f:
+            f.write(TEMPLATE)
+        for i in range(12):
+            directory = os.path.join(self.content, f"section{i % 3}", f"post{i}")
+            os.makedirs(directory)
+            with open(os.path.join(directory, "index.md"), "w") as f:
+                f.write(f"# Post {i}\n\nSome **bold** text\n\n* one\n* two {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, dest, jobs, stream=False):
+        main.verbosity = 2
+        self.addCleanup(setattr, main, "verbosity", 0)
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            generate_pages_recursive(
+                self.content, self.template, dest, jobs=jobs, stream=stream
+            )
+        return log.getvalue()
+
+    def read_tree(self, root):
+        files = {}
+        for dir_path, _, file_names in os.walk(root):
+            for name in file_names:
+                path = os.path.join(dir_path, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_find_pages_maps_sources_to_html(self):
+        dest = os.path.join(self.root, "public")
+        pages = find_pages(self.content, dest)
+        self.assertEqual(len(pages), 12)
+        for source, output in pages:
+            self.assertTrue(source.endswith("index.md"))
+            self.assertEqual(
+                os.path.relpath(output, dest),
+                os.path.relpath(source, self.content)[: -len(".md")] + ".html",
+            )
+
+    def test_parallel_build_matches_serial_build(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        serial_log = self.build(serial, jobs=1)
+        parallel_log = self.build(parallel, jobs=4)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+        self.assertEqual(
+            serial_log.replace(serial, "<dest>"),
+            parallel_log.replace(parallel, "<dest>"),
+        )
+        self.assertIn("generating page from", serial_log)
+
+    def test_streamed_build_matches_build(self):
+        expected = os.path.join(self.root, "public")
+        self.build(expected, jobs=1)
+        for jobs in (1, 4):
+            dest = os.path.join(self.root, f"stream{jobs}")
+            self.build(dest, jobs=jobs, stream=True)
+            self.assertEqual(self.read_tree(expected), self.read_tree(dest))
+
+    def test_rebuild_keeps_unchanged_pages(self):
+        dest = os.path.join(self.root, "public")
+        self.build(dest, jobs=1)
+        page = os.path.join(dest, "section0", "post0", "index.html")
+        edited = os.path.join(dest, "section1", "post1", "index.html")
+        os.utime(page, ns=(1, 1_000_000_000))
+        os.utime(edited, ns=(1, 1_000_000_000))
+        source = os.path.join(self.content, "section1", "post1", "index.md")
+        with open(source, "a") as f:
+            f.write("\n\nMore text")
+        # no manifest, so every page is rendered again
+        self.build(dest, jobs=1)
+        self.assertEqual(os.stat(page).st_mtime_ns, 1_000_000_000)
+        self.assertNotEqual(os.stat(edited).st_mtime_ns, 1_000_000_000)
+
+    def test_quiet_by_default(self):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            generate_pages_recursive(
+                self.content, self.template, os.path.join(self.root, "public")
+            )
+        self.assertEqual(log.getvalue(), "")
+
+    def test_minified_build(self):
+        with open(self.template, "w") as f:
+            f.write('<html>\n  <body class="page">\n    {{ Content }}\n  </body>')
+        plain = os.path.join(self.root, "plain")
+        self.build(plain, jobs=1)
+        for jobs in (1, 4):
+            telemetry = BuildTelemetry()
+            dest = os.path.join(self.root, f"minified{jobs}")
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                dest,
+                jobs=jobs,
+                telemetry=telemetry,
+                minify=True,
+            )
+            before = sum(map(len, self.read_tree(plain).values()))
+            after = sum(map(len, self.read_tree(dest).values()))
+            self.assertEqual(telemetry.bytes_saved, before - after)
+            self.assertGreater(telemetry.bytes_saved, 0)
+
+    def test_telemetry(self):
+        for jobs in (1, 4):
+            telemetry = BuildTelemetry(top=3)
+            telemetry.start()
+            dest = os.path.join(self.root, f"public{jobs}")
+            generate_pages_recursive(
+                self.content, self.template, dest, jobs=jobs, telemetry=telemetry
+            )
+            report = telemetry.report()
+            self.assertEqual(report["pages"], {"generated": 12, "skipped": 0})
+            self.assertEqual(list(report["phases"]), ["walk", "pages"])
+            self.assertGreater(report["page_stages"]["parse"], 0)
+            slowest = report["slowest_pages"]
+            self.assertEqual(len(slowest), 3)
+            self.assertGreaterEqual(slowest[0]["seconds"], slowest[-1]["seconds"])
+            source = slowest[0]["source"]
+            self.assertEqual(slowest[0]["source_bytes"], os.path.getsize(source))
+            self.assertGreater(slowest[0]["output_bytes"], 0)
+
+
+
+class TestTemplateValues(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+        os.makedirs("static")
+        os.makedirs("content/post")
+        with open("template.html", "w") as f:
+            f.write(
+                '<meta name="description" content="{{ Description }}">'
+                "<title>{{ Title }} - {{ SiteName }}</title>"
+                "<time>{{ Date }}</time><link href='{{ SiteUrl }}/'>{{ Content }}"
+            )
+        with open("content/index.md", "w") as f:
+            f.write("# Home\n\nWelcome to \"the\" *blog*")
+        with open("content/post/index.md", "w") as f:
+            f.write("# Post\n\n* list\n\nFirst paragraph")
+        os.utime("content/post/index.md", (0, 86400 * 365))
+
+    def build(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.main(["--no-gzip", "--value", "SiteName=My Blog", *args])
+        with open("public/post/index.html") as f:
+            return f.read()
+
+    def test_site_and_page_values(self):
+        html = self.build("--site-url", "https://example.com/")
+        self.assertIn("<title>Post - My Blog</title>", html)
+        self.assertIn("<time>1971-01-01</time>", html)
+        self.assertIn('content="First paragraph"', html)
+        self.assertIn("href='https://example.com/'", html)
+        with open("public/index.html") as f:
+            self.assertIn('content="Welcome to &quot;the&quot; blog"', f.read())
+        with open("public/archive/index.html") as f:
+            self.assertNotIn("{{", f.read())
+
+    def test_parallel_build_fills_page_values(self):
+        self.assertEqual(self.build("-j", "2"), self.build("-j", "1", "-v"))
+
+    def test_malformed_value(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                main.main(["--value", "no equals sign"])
+
+    def test_generated_path_conflicts(self):
+        os.makedirs("content/archive")
+        with open("content/archive/index.md", "w") as f:
+            f.write("# Archive")
+        with open("static/feed.xml", "w") as f:
+            f.write("<feed/>")
+        with self.assertRaises(SystemExit) as cm:
+            self.build()
+        self.assertIn(os.path.join("content", "archive", "index.md"), str(cm.exception))
+        self.assertIn(os.path.join("static", "feed.xml"), str(cm.exception))
+        self.assertFalse(os.path.exists("public"))
+
+
+class TestStreamPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.template = compile_template(TEMPLATE)
+
+    def write_source(self, text):
+        path = os.path.join(self.tmp.name, "page.md")
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_matches_write_page(self):
+        text = (
+            "\n# Title\n\n```\ncode\n\nmore\n```\n\n> quote\n\n"
+            "1. one\n2. two\n\nSome *text* and `code`\n"
+        )
+        source = self.write_source(text)
+        expected = os.path.join(self.tmp.name, "expected.html")
+        streamed = os.path.join(self.tmp.name, "out", "streamed.html")
+        write_page(text, self.template, expected)
+        stream_page(source, self.template, streamed)
+        with open(expected) as f, open(streamed) as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_memory_is_bounded_by_block_not_page(self):
+        block = "Some **bold** text and a [link](/somewhere). " * 20
+        blocks = 4000
+        source = self.write_source("# Big\n\n" + f"{block}\n\n" * blocks)
+        dest = os.path.join(self.tmp.name, "page.html")
+        tracemalloc.start()
+        try:
+            stream_page(source, self.template, dest)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(os.path.getsize(source), len(block) * blocks)
+        # a few blocks' worth of parsing and rendering state on top of fixed
+        # overhead (buffers, regex caches), never anything proportional to
+        # the page
+        self.assertLess(peak, 16 * len(block) + (64 << 10))
+        self.assertLess(peak, os.path.getsize(source) / 20)
+
+    def test_write_page_does_not_hold_the_output(self):
+        block = "Some **bold** text and a [link](/somewhere). " * 20
+        text = "# Big\n\n" + f"{block}\n\n" * 1000
+        dest = os.path.join(self.tmp.name, "page.html")
+        peaks = []
+        for func in (
+            lambda: markdown_to_html_node(text),
+            lambda: write_page(text, self.template, dest),
+        ):
+            tracemalloc.start()
+            try:
+                func()
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        # the node tree is unavoidable, the rendered page on top of it isn't
+        parsed, written = peaks
+        self.assertLess(written, parsed + os.path.getsize(dest) / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from main import generate_pages_recursive
+from manifest import BuildManifest
+from template import load_template
+
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest_path = os.path.join(self.root, ".build", "manifest.json")
+        os.makedirs(os.path.join(self.content, "post"))
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nworld")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, renderer_version="1"):
+        manifest = BuildManifest.load(
+            self.manifest_path, load_template(self.template).digest, renderer_version
+        )
+        generate_pages_recursive(self.content, self.template, self.public, manifest)
+        removed = manifest.prune()
+        manifest.save()
+        return manifest, removed
+
+    def output_mtimes(self):
+        return {
+            name: os.stat(os.path.join(self.public, name)).st_mtime_ns
+            for name in ("index.html", os.path.join("post", "index.html"))
+        }
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        before = self.output_mtimes()
+        os.utime(os.path.join(self.public, "index.html"), ns=(1, 1))
+        os.utime(os.path.join(self.public, "post", "index.html"), ns=(1, 1))
+        self.build()
+        after = self.output_mtimes()
+        self.assertNotEqual(before, after)
+        self.assertEqual(set(after.values()), {1})
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nchanged")
+        self.build()
+        with open(os.path.join(self.public, "index.html")) as f:
+            self.assertIn("changed", f.read())
+
+    def test_template_change_invalidates_every_page(self):
+        self.build()
+        self.write(self.template, TEMPLATE + "<!-- v2 -->")
+        manifest = BuildManifest.load(
+            self.manifest_path, load_template(self.template).digest, "1"
+        )
+        self.assertTrue(manifest.invalidated)
+        self.build()
+        with open(os.path.join(self.public, "post", "index.html")) as f:
+            self.assertIn("v2", f.read())
+
+    def test_renderer_version_invalidates_every_page(self):
+        self.build()
+        manifest = BuildManifest.load(
+            self.manifest_path, load_template(self.template).digest, "2"
+        )
+        self.assertTrue(manifest.invalidated)
+
+    def test_removed_source_output_is_deleted(self):
+        self.build()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        _, removed = self.build()
+        dest = os.path.join(self.public, "post", "index.html")
+        self.assertEqual(removed, [os.path.normpath(dest)])
+        self.assertFalse(os.path.exists(dest))
+
+    def test_missing_output_is_regenerated(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        self.build()
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+import minify
+from minify import HTMLMinifier, minify_attributes
+
+
+def minified(fragments):
+    out = []
+    minifier = HTMLMinifier(out.append)
+    for fragment in fragments:
+        minifier.write(fragment)
+    minifier.close()
+    return "".join(out), minifier.saved
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+
+<head>
+    <meta charset="utf-8">
+    <!-- page title -->
+    <title> Hello </title>
+    <link href="/index.css" rel="stylesheet">
+</head>
+
+<body>
+    <article>
+        <div><p>Some   <b>bold</b> <i>text</i>
+and a <a href="/" target="_blank">link</a></p><pre><code>keep
+    this   as is</code></pre><p>x < y and <code>a  <  b</code> end</p></div>
+    </article>
+</body>
+
+</html>
+"""
+
+EXPECTED = (
+    "<!DOCTYPE html><html><head><meta charset=utf-8><title>Hello</title>"
+    "<link href=/index.css rel=stylesheet></head><body><article><div>"
+    '<p>Some <b>bold</b> <i>text</i> and a <a href="/" target=_blank>link</a>'
+    "</p><pre><code>keep\n    this   as is</code></pre>"
+    "<p>x < y and <code>a  <  b</code> end</p></div></article></body></html>"
+)
+
+
+class TestHTMLMinifier(unittest.TestCase):
+    def test_page(self):
+        html, saved = minified([PAGE])
+        self.assertEqual(html, EXPECTED)
+        self.assertEqual(saved, len(PAGE) - len(EXPECTED))
+
+    def test_fragments_may_split_anything(self):
+        old = minify.CHUNK_SIZE
+        self.addCleanup(setattr, minify, "CHUNK_SIZE", old)
+        for chunk_size in (1, 3, 16):
+            minify.CHUNK_SIZE = chunk_size
+            for size in (1, 2, 5, 7):
+                fragments = [PAGE[i : i + size] for i in range(0, len(PAGE), size)]
+                with self.subTest(chunk_size=chunk_size, size=size):
+                    self.assertEqual(minified(fragments)[0], EXPECTED)
+
+    def test_attributes(self):
+        self.assertEqual(
+            minify_attributes(' href="/a/b"  alt="two words" hidden data-x=\'1\''),
+            ' href=/a/b alt="two words" hidden data-x=1',
+        )
+        # a value ending in a slash, or a self-closing tag, keeps its quotes
+        self.assertEqual(minify_attributes(' href="/"'), ' href="/"')
+        self.assertEqual(minify_attributes(' d="M0" /'), ' d="M0"/')
+        self.assertEqual(minify_attributes(' v=""'), ' v=""')
+
+    def test_inline_whitespace_becomes_one_space(self):
+        html, _ = minified(["<p><b>a</b>\n\n   <i>b</i></p>"])
+        self.assertEqual(html, "<p><b>a</b> <i>b</i></p>")
+
+    def test_unterminated_input_is_kept(self):
+        html, _ = minified(["<p>text</p><!-- open"])
+        self.assertEqual(html, "<p>text</p><!-- open")
+
+
+if __name__ == "__main__":
+    unittest.main()
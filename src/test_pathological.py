@@ -0,0 +1,98 @@
+import time
+import unittest
+
+from html_markdown import (
+    block_to_block_type,
+    is_markdown_code_block,
+    is_markdown_heading_block,
+    is_markdown_ordered_list_block,
+    is_markdown_quote_block,
+    is_markdown_unordered_list_block,
+    markdown_to_html_node,
+    scan_blocks,
+)
+from textnode import extract_markdown_images, extract_markdown_links, scan_inline
+
+
+# every input is large enough that a quadratic path would take minutes, so a
+# generous budget still catches a regression without being flaky on slow CI
+TIME_BUDGET = 1.0
+N = 200_000
+
+
+class TestPathologicalInputs(unittest.TestCase):
+    def assertFast(self, func, text, *args):
+        start = time.perf_counter()
+        func(text, *args)
+        elapsed = time.perf_counter() - start
+        self.assertLess(
+            elapsed,
+            TIME_BUDGET,
+            f"{func.__name__} took {elapsed:.2f}s on {len(text)} characters",
+        )
+
+    def assertFastRaises(self, exception, func, text):
+        start = time.perf_counter()
+        with self.assertRaises(exception):
+            func(text)
+        self.assertLess(time.perf_counter() - start, TIME_BUDGET)
+
+    def test_many_quote_lines_with_bad_last_line(self):
+        text = "> quoted\n" * (N // 10) + "not quoted"
+        self.assertFast(is_markdown_quote_block, text)
+        self.assertFast(block_to_block_type, text)
+
+    def test_many_list_lines_with_bad_last_line(self):
+        self.assertFast(is_markdown_unordered_list_block, "* item\n" * (N // 7) + "x")
+        self.assertFast(is_markdown_ordered_list_block, "1. item\n" * (N // 8) + "x")
+
+    def test_code_block_with_many_fences(self):
+        text = "```" + "``` a\n" * (N // 6)
+        self.assertFast(is_markdown_code_block, text)
+        self.assertFast(lambda t: list(scan_blocks(t.split("\n"))), text)
+
+    def test_long_heading_lines(self):
+        self.assertFast(is_markdown_heading_block, "# " + " " * N + "\nx")
+        self.assertFast(is_markdown_heading_block, "# " + " " * N + "a\nb")
+        self.assertFast(block_to_block_type, "# " + " " * N + "a\nb")
+        self.assertFast(
+            lambda t: markdown_to_html_node(t, engine="split"), "# " + " " * N + "a\nb"
+        )
+        self.assertFast(is_markdown_heading_block, "#" * N)
+
+    def test_very_long_line(self):
+        text = "word **bold** *it* `code` [link](/url) " * (N // 40)
+        self.assertFast(scan_inline, text)
+        self.assertFast(markdown_to_html_node, text)
+
+    def test_unclosed_brackets(self):
+        for text in [
+            "[" * N,
+            "![" * (N // 2),
+            "[a](" * (N // 4),
+            "[" + "a" * N,
+            "[a]" * (N // 3),
+            "](" * (N // 2),
+        ]:
+            with self.subTest(text=text[:8]):
+                self.assertFast(extract_markdown_links, text)
+                self.assertFast(extract_markdown_images, text)
+                self.assertFast(scan_inline, text)
+
+    def test_unclosed_delimiters(self):
+        for text in ["**" + "a" * N, "`" + "a" * N, "*a " * (N // 3) + "*"]:
+            with self.subTest(text=text[:8]):
+                self.assertFastRaises(ValueError, scan_inline, text)
+
+    def test_many_blocks(self):
+        text = "> quote\n\n* item\n\n1. item\n\n# heading\n\npara\n\n" * (N // 50)
+        self.assertFast(markdown_to_html_node, text)
+        self.assertFast(markdown_to_html_node, text, "split")
+
+    def test_thousands_of_nested_list_markers(self):
+        text = "\n".join("- " * i + "item" for i in range(2000))
+        self.assertFast(markdown_to_html_node, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
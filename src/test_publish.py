@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+from publish import output_file, publish, same_contents
+
+
+class TestOutputFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "page.html")
+        with open(self.path, "w") as f:
+            f.write("<p>old</p>")
+        os.utime(self.path, ns=(1, 1_000_000_000))
+
+    def test_unchanged_output_keeps_file_and_mtime(self):
+        inode = os.stat(self.path).st_ino
+        with output_file(self.path) as f:
+            f.write("<p>old</p>")
+        st = os.stat(self.path)
+        self.assertEqual((st.st_ino, st.st_mtime_ns), (inode, 1_000_000_000))
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+    def test_changed_output_replaces_file(self):
+        inode = os.stat(self.path).st_ino
+        with output_file(self.path) as f:
+            f.write("<p>new</p>")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "<p>new</p>")
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+
+    def test_failed_write_keeps_old_file(self):
+        with self.assertRaises(ValueError):
+            with output_file(self.path) as f:
+                f.write("<p>half")
+                raise ValueError("render failed")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "<p>old</p>")
+        self.assertEqual(os.listdir(self.tmp.name), ["page.html"])
+
+    def test_same_contents(self):
+        other = os.path.join(self.tmp.name, "other.html")
+        with open(other, "w") as f:
+            f.write("<p>new</p>")
+        self.assertFalse(same_contents(self.path, other))
+        self.assertTrue(same_contents(self.path, self.path))
+        self.assertFalse(same_contents(self.path, other + ".missing"))
+
+
+class TestPublish(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.staging = os.path.join(self.root, ".build", "staging")
+        self.generations = os.path.join(self.root, ".build", "generations")
+        self.public = os.path.join(self.root, "public")
+        self.write(os.path.join(self.staging, "index.html"), "home")
+        self.write(os.path.join(self.staging, "post", "index.html"), "post")
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def publish(self):
+        return publish(self.staging, self.public, self.generations)
+
+    def test_publish_links_public_to_a_snapshot(self):
+        stats = self.publish()
+        self.assertEqual(stats.files, 2)
+        self.assertTrue(os.path.islink(self.public))
+        self.assertEqual(self.read("post", "index.html"), "post")
+        # unchanged files share the staging inode, and so keep their mtime
+        self.assertEqual(
+            os.stat(os.path.join(self.public, "index.html")).st_ino,
+            os.stat(os.path.join(self.staging, "index.html")).st_ino,
+        )
+
+    def test_published_site_is_unaffected_by_the_next_build(self):
+        self.publish()
+        with output_file(os.path.join(self.staging, "index.html")) as f:
+            f.write("new home")
+        self.assertEqual(self.read("index.html"), "home")
+        self.publish()
+        self.assertEqual(self.read("index.html"), "new home")
+
+    def test_keeps_only_the_current_and_previous_generation(self):
+        first = self.publish().generation
+        second = self.publish().generation
+        stats = self.publish()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(
+            sorted(os.listdir(self.generations)),
+            sorted(os.path.basename(p) for p in (second, stats.generation)),
+        )
+
+    def test_replaces_a_plain_public_directory(self):
+        self.write(os.path.join(self.public, "stale.html"), "stale")
+        self.publish()
+        self.assertTrue(os.path.islink(self.public))
+        self.assertEqual(self.read("index.html"), "home")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "stale.html")))
+        self.assertEqual(len(os.listdir(self.generations)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from search_index import SearchIndex, page_terms, search, shard_name, tokenize
+from site_index import SiteIndex
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.shards = os.path.join(self.public, "search")
+        self.write("index.md", "# Home\n\nThe **shire** and a [ring](/ring/)\n", 1)
+        self.write(
+            "post/index.md",
+            "# Mordor\n\n* one ring\n* two towers\n\n```\nforge(ring)\n```\n",
+            1,
+        )
+        self.site_index = SiteIndex(os.path.join(self.root, ".build", "site.sqlite"))
+        self.addCleanup(self.site_index.close)
+        self.index = SearchIndex(self.site_index)
+
+    def write(self, rel_path, text, mtime):
+        path = os.path.join(self.content, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+
+    def update(self):
+        pages = []
+        for rel_path in ("index.md", os.path.join("post", "index.md")):
+            source = os.path.join(self.content, rel_path)
+            if os.path.exists(source):
+                dest = os.path.join(self.public, rel_path[: -len(".md")] + ".html")
+                pages.append((source, dest))
+        self.site_index.update(pages, self.public)
+        stats = self.index.update()
+        stats.shards = self.index.write(self.public)
+        return stats
+
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("The Shire, a ring-bearer"), ["the", "shire", "ring", "bearer"]
+        )
+        self.assertEqual(shard_name("shire"), "sh")
+        self.assertEqual(shard_name("éa"), "_c3a961")
+
+    def test_page_terms_come_from_text_nodes(self):
+        title, counts = page_terms(os.path.join(self.content, "index.md"))
+        self.assertEqual(title, "Home")
+        self.assertEqual(counts["home"], 6)
+        self.assertEqual(counts["shire"], 1)
+        # link text is indexed, its url is not
+        self.assertEqual(counts["ring"], 1)
+        self.assertNotIn("/ring/", counts)
+
+    def test_search(self):
+        self.update()
+        self.assertEqual(
+            search(self.shards, "ring"), [("/post/", "Mordor"), ("/", "Home")]
+        )
+        self.assertEqual(search(self.shards, "ring shire"), [("/", "Home")])
+        self.assertEqual(search(self.shards, "forge"), [("/post/", "Mordor")])
+        self.assertEqual(search(self.shards, "balrog"), [])
+
+    def test_search_only_loads_the_shards_it_needs(self):
+        self.update()
+        shards = {}
+        search(self.shards, "ring towers", shards)
+        self.assertEqual(sorted(shards), ["docs", "ri", "to"])
+
+    def test_update_only_rewrites_affected_shards(self):
+        self.assertEqual(self.update().indexed, 2)
+        untouched = os.path.join(self.shards, "sh.json")
+        os.utime(untouched, ns=(1, 1_000_000_000))
+
+        self.write("post/index.md", "# Mordor\n\nThe balrog\n", 2)
+        stats = self.update()
+        self.assertEqual((stats.indexed, stats.unchanged), (1, 1))
+        self.assertEqual(os.stat(untouched).st_mtime_ns, 1_000_000_000)
+        self.assertEqual(search(self.shards, "balrog"), [("/post/", "Mordor")])
+        self.assertEqual(search(self.shards, "towers"), [])
+        self.assertFalse(os.path.exists(os.path.join(self.shards, "to.json")))
+
+    def test_removed_pages_leave_the_index(self):
+        self.update()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        self.assertEqual(self.update().removed, 1)
+        self.assertEqual(search(self.shards, "ring"), [("/", "Home")])
+        self.assertEqual(search(self.shards, "mordor"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,452 @@
+import gzip
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+# server.py lives at the repository root, next to src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import (  # noqa: E402
+    FINGERPRINTS_FILE,
+    CachedFile,
+    CORSHTTPRequestHandler,
+    FileCache,
+    make_server,
+    parse_ranges,
+)
+
+
+class QuietHandler(CORSHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ServerTestCase(unittest.TestCase):
+    backend = "threads"
+    handler_class = QuietHandler
+    cache_size = 0
+    livereload = False
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.write("index.html", "<p>home</p>")
+        self.httpd = make_server(
+            handler_class=self.handler_class,
+            port=0,
+            directory=self.root,
+            backend=self.backend,
+            workers=4,
+            cache_size=self.cache_size,
+            livereload=self.livereload,
+        )
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        return path
+
+    def connect(self):
+        return http.client.HTTPConnection("localhost", self.port, timeout=5)
+
+    def request(self, method, path, headers=None):
+        conn = self.connect()
+        try:
+            conn.request(method, path, headers=headers or {})
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+
+class TestConcurrentServer(ServerTestCase):
+    def test_get(self):
+        response, body = self.request("GET", "/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>home</p>")
+        self.assertEqual(response.getheader("Access-Control-Allow-Origin"), "*")
+
+    def test_options(self):
+        response, body = self.request("OPTIONS", "/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+        self.assertEqual(
+            response.getheader("Access-Control-Allow-Methods"), "GET, OPTIONS"
+        )
+
+    def test_keep_alive(self):
+        conn = self.connect()
+        try:
+            for _ in range(3):
+                conn.request("GET", "/index.html")
+                response = conn.getresponse()
+                self.assertEqual(response.read(), b"<p>home</p>")
+                self.assertEqual(response.version, 11)
+            conn.request("OPTIONS", "/")
+            self.assertEqual(conn.getresponse().read(), b"")
+            conn.request("GET", "/")
+            self.assertEqual(conn.getresponse().read(), b"<p>home</p>")
+        finally:
+            conn.close()
+
+    def test_stalled_client_does_not_block_others(self):
+        stalled = socket.create_connection(("localhost", self.port))
+        try:
+            stalled.sendall(b"GET / HTTP/1.1\r\n")
+            response, body = self.request("GET", "/")
+            self.assertEqual(body, b"<p>home</p>")
+        finally:
+            stalled.close()
+
+
+class TestParseRanges(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_ranges("bytes=0-9", 100), [(0, 9)])
+        self.assertEqual(parse_ranges("bytes=90-", 100), [(90, 99)])
+        self.assertEqual(parse_ranges("bytes=-10", 100), [(90, 99)])
+        self.assertEqual(parse_ranges("bytes=-500", 100), [(0, 99)])
+        self.assertEqual(parse_ranges("bytes=50-500", 100), [(50, 99)])
+
+    def test_overlapping_ranges_are_merged(self):
+        self.assertEqual(
+            parse_ranges("bytes=20-29, 0-9, 5-14, 30-39", 100), [(0, 14), (20, 39)]
+        )
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_ranges("bytes=100-", 100), [])
+        self.assertEqual(parse_ranges("bytes=-0", 100), [])
+        self.assertEqual(parse_ranges("bytes=0-", 0), [])
+
+    def test_malformed_headers_are_ignored(self):
+        for header in ["items=0-9", "bytes=", "bytes=9-0", "bytes=a-b", "bytes=-"]:
+            self.assertIsNone(parse_ranges(header, 100), header)
+        self.assertIsNone(parse_ranges("bytes=" + ",".join(["0-0"] * 17), 100))
+
+
+class TestFileServing(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = bytes(range(256)) * 64
+        self.write("blob.bin", self.data)
+
+    def test_full_file(self):
+        response, body = self.request("GET", "/blob.bin")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response.getheader("Accept-Ranges"), "bytes")
+
+    def test_copy_without_sendfile(self):
+        self.httpd.RequestHandlerClass.func.use_sendfile = False
+        try:
+            response, body = self.request("GET", "/blob.bin", {"Range": "bytes=5-"})
+        finally:
+            del self.httpd.RequestHandlerClass.func.use_sendfile
+        self.assertEqual(body, self.data[5:])
+
+    def test_single_range(self):
+        response, body = self.request("GET", "/blob.bin", {"Range": "bytes=100-299"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.data[100:300])
+        self.assertEqual(
+            response.getheader("Content-Range"), f"bytes 100-299/{len(self.data)}"
+        )
+
+    def test_suffix_range(self):
+        response, body = self.request("GET", "/blob.bin", {"Range": "bytes=-10"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.data[-10:])
+
+    def test_multiple_ranges(self):
+        response, body = self.request("GET", "/blob.bin", {"Range": "bytes=0-3,-4"})
+        self.assertEqual(response.status, 206)
+        ctype = response.getheader("Content-Type")
+        self.assertTrue(ctype.startswith("multipart/byteranges; boundary="))
+        boundary = ctype.split("boundary=")[1].encode()
+        self.assertEqual(int(response.getheader("Content-Length")), len(body))
+        parts = body.split(b"--" + boundary)
+        self.assertEqual(parts[-1], b"--\r\n")
+        first, second = (part.split(b"\r\n\r\n", 1) for part in parts[1:3])
+        size = len(self.data)
+        self.assertIn(f"Content-Range: bytes 0-3/{size}".encode(), first[0])
+        self.assertEqual(first[1], self.data[:4] + b"\r\n")
+        self.assertIn(f"Content-Range: bytes {size - 4}-{size - 1}".encode(), second[0])
+        self.assertEqual(second[1], self.data[-4:] + b"\r\n")
+
+    def test_unsatisfiable_range(self):
+        response, body = self.request(
+            "GET", "/blob.bin", {"Range": f"bytes={len(self.data)}-"}
+        )
+        self.assertEqual(response.status, 416)
+        self.assertEqual(
+            response.getheader("Content-Range"), f"bytes */{len(self.data)}"
+        )
+        self.assertEqual(body, b"")
+
+    def test_stale_if_range_sends_whole_file(self):
+        headers = {"Range": "bytes=0-9", "If-Range": "Thu, 01 Jan 1970 00:00:00 GMT"}
+        response, body = self.request("GET", "/blob.bin", headers)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.data)
+
+    def test_head_range(self):
+        response, body = self.request("HEAD", "/blob.bin", {"Range": "bytes=0-9"})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.getheader("Content-Length"), "10")
+        self.assertEqual(body, b"")
+
+    def test_ranges_on_a_keep_alive_connection(self):
+        conn = self.connect()
+        try:
+            for start in (0, 1000, 5000):
+                conn.request("GET", "/blob.bin", headers={"Range": f"bytes={start}-"})
+                self.assertEqual(conn.getresponse().read(), self.data[start:])
+        finally:
+            conn.close()
+
+    def test_directory_redirect(self):
+        os.makedirs(os.path.join(self.root, "post"))
+        response, body = self.request("GET", "/post")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/post/")
+
+
+class TestConditionalRequests(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = self.write("index.css", "body {}")
+
+    def test_validators(self):
+        response, _ = self.request("GET", "/index.css")
+        self.assertRegex(response.getheader("ETag"), r'^"[0-9a-f]{32}"$')
+        self.assertIsNotNone(response.getheader("Last-Modified"))
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+
+    def test_if_none_match(self):
+        etag = self.request("GET", "/index.css")[0].getheader("ETag")
+        for header in [etag, f'"other", W/{etag}', "*"]:
+            response, body = self.request(
+                "GET", "/index.css", {"If-None-Match": header}
+            )
+            self.assertEqual(response.status, 304)
+            self.assertEqual(response.getheader("ETag"), etag)
+            self.assertEqual(body, b"")
+        response, _ = self.request("GET", "/index.css", {"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+
+    def test_if_none_match_takes_precedence(self):
+        response, _ = self.request("GET", "/index.css")
+        headers = {
+            "If-None-Match": '"other"',
+            "If-Modified-Since": response.getheader("Last-Modified"),
+        }
+        self.assertEqual(self.request("GET", "/index.css", headers)[0].status, 200)
+
+    def test_if_modified_since(self):
+        last_modified = self.request("GET", "/index.css")[0].getheader("Last-Modified")
+        headers = {"If-Modified-Since": last_modified}
+        self.assertEqual(self.request("GET", "/index.css", headers)[0].status, 304)
+
+    def test_etag_changes_with_content(self):
+        etag = self.request("GET", "/index.css")[0].getheader("ETag")
+        self.write("index.css", "body []")
+        os.utime(self.path, ns=(1, 1))
+        response, body = self.request("GET", "/index.css", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"body []")
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+    def test_if_range_with_etag(self):
+        etag = self.request("GET", "/index.css")[0].getheader("ETag")
+        response, body = self.request(
+            "GET", "/index.css", {"Range": "bytes=0-3", "If-Range": etag}
+        )
+        self.assertEqual((response.status, body), (206, b"body"))
+        response, body = self.request(
+            "GET", "/index.css", {"Range": "bytes=0-3", "If-Range": '"other"'}
+        )
+        self.assertEqual((response.status, body), (200, b"body {}"))
+
+    def test_fingerprinted_assets_are_immutable(self):
+        self.write("index.3f2a9c1d.css", "body {}")
+        self.write(FINGERPRINTS_FILE, json.dumps(["/index.3f2a9c1d.css"]))
+        response, _ = self.request("GET", "/index.3f2a9c1d.css")
+        self.assertIn("immutable", response.getheader("Cache-Control"))
+
+    def test_only_listed_names_are_immutable(self):
+        # a date stamp looks like a fingerprint, but the build never made it
+        self.write("images/trip.20230515.png", b"png")
+        response, _ = self.request("GET", "/images/trip.20230515.png")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        self.write(FINGERPRINTS_FILE, json.dumps(["/images/trip.20230515.png"]))
+        response, _ = self.request("GET", "/images/trip.20230515.png")
+        self.assertIn("immutable", response.getheader("Cache-Control"))
+
+    def test_configured_cache_control(self):
+        httpd = make_server(
+            handler_class=QuietHandler, port=0, cache_control="max-age=60"
+        )
+        try:
+            handler = httpd.RequestHandlerClass.func
+            self.assertEqual(handler.cache_control, "max-age=60")
+            self.assertEqual(handler.__name__, "QuietHandler")
+        finally:
+            httpd.server_close()
+
+
+class TestLiveReload(ServerTestCase):
+    livereload = True
+
+    def open_stream(self):
+        sock = socket.create_connection(("localhost", self.port), timeout=5)
+        self.addCleanup(sock.close)
+        sock.sendall(b"GET /__livereload HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        self.assertIn(b"text/event-stream", sock.recv(4096))
+        return sock
+
+    def test_open_streams_do_not_block_requests(self):
+        # more streams than the pool would have had workers
+        for _ in range(6):
+            self.open_stream()
+        response, body = self.request("GET", "/index.html")
+        self.assertEqual((response.status, body), (200, b"<p>home</p>"))
+
+    def test_marker_change_reloads(self):
+        sock = self.open_stream()
+        self.write(".livereload", "1")
+        self.assertIn(b"data: reload", sock.recv(4096))
+
+
+class TestPrecompressed(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = "<p>" + "static site " * 200 + "</p>"
+        self.path = self.write("post/index.html", self.page)
+        self.write("post/index.html.gz", gzip.compress(self.page.encode(), mtime=0))
+        mtime = os.stat(self.path).st_mtime_ns
+        os.utime(self.path + ".gz", ns=(mtime, mtime))
+
+    def test_serves_gzip_when_accepted(self):
+        response, body = self.request(
+            "GET", "/post/", {"Accept-Encoding": "br, gzip;q=0.8"}
+        )
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+        self.assertEqual(int(response.getheader("Content-Length")), len(body))
+        self.assertEqual(gzip.decompress(body).decode(), self.page)
+
+    def test_serves_identity_otherwise(self):
+        for headers in [{}, {"Accept-Encoding": "gzip;q=0, deflate"}]:
+            response, body = self.request("GET", "/post/index.html", headers)
+            self.assertIsNone(response.getheader("Content-Encoding"))
+            self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+            self.assertEqual(body.decode(), self.page)
+
+    def test_variants_have_distinct_etags(self):
+        plain = self.request("GET", "/post/")[0].getheader("ETag")
+        headers = {"Accept-Encoding": "gzip"}
+        gzipped = self.request("GET", "/post/", headers)[0].getheader("ETag")
+        self.assertNotEqual(plain, gzipped)
+        headers["If-None-Match"] = gzipped
+        response, _ = self.request("GET", "/post/", headers)
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+
+    def test_stale_gzip_is_ignored(self):
+        self.write("post/index.html", "<p>new</p>")
+        response, body = self.request("GET", "/post/", {"Accept-Encoding": "gzip"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertIsNone(response.getheader("Vary"))
+        self.assertEqual(body, b"<p>new</p>")
+
+
+def cached_file(data):
+    return CachedFile(None, None, None, None, data, ())
+
+
+class TestFileCacheEviction(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = FileCache(max_bytes=10)
+        for key in "abc":
+            cache.put(key, cached_file(b"xxxx"))
+        self.assertEqual(list(cache.entries), ["b", "c"])
+        self.assertIsNotNone(cache.get("b"))
+        cache.put("d", cached_file(b"xxxx"))
+        self.assertEqual(list(cache.entries), ["b", "d"])
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+
+class TestFileCache(ServerTestCase):
+    cache_size = 4096
+
+    def stats(self):
+        return json.loads(self.request("GET", "/__cache")[1])
+
+    def test_hits_and_misses(self):
+        for _ in range(3):
+            self.assertEqual(self.request("GET", "/")[1], b"<p>home</p>")
+        stats = self.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertEqual(stats["bytes"], len(b"<p>home</p>"))
+
+    def test_modified_file_is_reloaded(self):
+        self.request("GET", "/index.html")
+        path = self.write("index.html", "<p>away</p>")
+        os.utime(path, ns=(1, 1))
+        self.assertEqual(self.request("GET", "/index.html")[1], b"<p>away</p>")
+        self.assertEqual(self.stats()["misses"], 2)
+
+    def test_new_gzip_variant_invalidates(self):
+        self.request("GET", "/", {"Accept-Encoding": "gzip"})
+        gz = self.write("index.html.gz", gzip.compress(b"<p>home</p>"))
+        mtime = os.stat(os.path.join(self.root, "index.html")).st_mtime_ns
+        os.utime(gz, ns=(mtime, mtime))
+        response, body = self.request("GET", "/", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), b"<p>home</p>")
+
+    def test_cached_ranges_and_conditionals(self):
+        etag = self.request("GET", "/")[0].getheader("ETag")
+        response, body = self.request("GET", "/", {"Range": "bytes=3-6"})
+        self.assertEqual((response.status, body), (206, b"home"))
+        response, _ = self.request("GET", "/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(self.stats()["hits"], 2)
+
+    def test_large_files_are_not_cached(self):
+        self.write("big.bin", b"x" * 8192)
+        self.assertEqual(len(self.request("GET", "/big.bin")[1]), 8192)
+        self.assertEqual(self.stats()["entries"], 0)
+
+
+class TestSingleBackend(ServerTestCase):
+    backend = "single"
+
+    def test_get(self):
+        response, body = self.request("GET", "/")
+        self.assertEqual(body, b"<p>home</p>")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_server(port=0, backend="fork")
+
+
+if __name__ == "__main__":
+    unittest.main()
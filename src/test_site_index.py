@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from site_index import SiteIndex, scan_source, url_path, write_feed, write_sitemap
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.write("index.md", "# Home\n\nSee [the post](/post/)\n", 1)
+        self.write(
+            "post/index.md",
+            "\n# A *Post*\n\nTwo words ![alt](/a.png)\n\n```\nnot counted\n```\n",
+            2,
+        )
+        self.index = SiteIndex(os.path.join(self.root, ".build", "site.sqlite"))
+        self.addCleanup(self.index.close)
+
+    def write(self, rel_path, text, mtime):
+        path = os.path.join(self.content, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+
+    def pages(self):
+        sources = []
+        for rel_path in ("index.md", os.path.join("post", "index.md")):
+            if os.path.exists(os.path.join(self.content, rel_path)):
+                dest = rel_path[: -len(".md")] + ".html"
+                sources.append(
+                    (
+                        os.path.join(self.content, rel_path),
+                        os.path.join(self.public, dest),
+                    )
+                )
+        return sources
+
+    def update(self):
+        return self.index.update(self.pages(), self.public)
+
+    def links(self, rel_path):
+        return self.index.links(os.path.join(self.content, rel_path))
+
+    def test_url_path(self):
+        self.assertEqual(url_path("index.html"), "/")
+        self.assertEqual(url_path(os.path.join("post", "index.html")), "/post/")
+        self.assertEqual(url_path("about.html"), "/about.html")
+
+    def test_scan_source(self):
+        title, words, links = scan_source(os.path.join(self.content, "index.md"))
+        self.assertEqual((title, words, links), ("Home", 3, ["/post/"]))
+        title, words, links = scan_source(os.path.join(self.content, "post/index.md"))
+        self.assertEqual((title, words, links), ("A *Post*", 2, []))
+
+    def test_update_only_scans_changed_sources(self):
+        stats = self.update()
+        self.assertEqual((stats.scanned, stats.unchanged), (2, 0))
+        self.assertEqual([page["path"] for page in self.index.pages()], ["/post/", "/"])
+        self.assertEqual(self.links("index.md"), ["/post/"])
+
+        stats = self.update()
+        self.assertEqual((stats.scanned, stats.unchanged), (0, 2))
+
+        self.write("index.md", "# New home\n\nNo links now\n", 3)
+        stats = self.update()
+        self.assertEqual((stats.scanned, stats.unchanged), (1, 1))
+        self.assertEqual(self.index.pages()[0]["title"], "New home")
+        self.assertEqual(self.links("index.md"), [])
+
+    def test_removed_sources_leave_the_index(self):
+        self.update()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        stats = self.update()
+        self.assertEqual(stats.removed, 1)
+        self.assertEqual([page["path"] for page in self.index.pages()], ["/"])
+
+    def test_sitemap_and_feed(self):
+        self.update()
+        pages = self.index.pages()
+        out = []
+        write_sitemap(pages, out.append, "https://example.com")
+        urlset = ET.fromstring("".join(out))
+        ns = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+        self.assertEqual(
+            [url.find(f"{ns}loc").text for url in urlset],
+            ["https://example.com/", "https://example.com/post/"],
+        )
+
+        out = []
+        write_feed(pages, out.append, "https://example.com", "Home", items=1)
+        items = ET.fromstring("".join(out)).findall("channel/item")
+        self.assertEqual([item.find("title").text for item in items], ["A *Post*"])
+        self.assertEqual(items[0].find("pubDate").text, "Thu, 01 Jan 1970 00:00:02 GMT")
+
+
+if __name__ == "__main__":
+    unittest.main()
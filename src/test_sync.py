@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from sync import scan_files, sync_tree
+
+
+class TestSyncTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.record = os.path.join(self.root, ".build", "static.json")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def sync(self, **kwargs):
+        return sync_tree(self.static, self.public, record_path=self.record, **kwargs)
+
+    def test_scan_files(self):
+        files = sorted(rel_path for rel_path, _ in scan_files(self.static))
+        self.assertEqual(files, [os.path.join("images", "a.png"), "index.css"])
+
+    def test_first_sync_copies_everything(self):
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped), (2, 0))
+        self.assertEqual(stats.copied_bytes, len("body {}") + len("png bytes"))
+        self.assertEqual(self.read("images", "a.png"), "png bytes")
+
+    def test_copies_preserve_mtime(self):
+        self.sync()
+        src = os.stat(os.path.join(self.static, "index.css"))
+        dst = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual(src.st_mtime_ns, dst.st_mtime_ns)
+
+    def test_unchanged_files_are_skipped(self):
+        self.sync()
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped), (0, 2))
+        self.assertEqual(stats.skipped_bytes, len("body {}") + len("png bytes"))
+
+    def test_touched_but_identical_file_is_skipped(self):
+        self.sync()
+        os.utime(os.path.join(self.static, "index.css"), ns=(1, 1))
+        stats = self.sync()
+        self.assertEqual(stats.copied, 0)
+        self.assertEqual(os.stat(os.path.join(self.public, "index.css")).st_mtime_ns, 1)
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        self.write(os.path.join(self.static, "index.css"), "body {color: red}")
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped), (1, 1))
+        self.assertEqual(self.read("index.css"), "body {color: red}")
+
+    def test_same_size_edit_is_copied(self):
+        self.sync()
+        self.write(os.path.join(self.static, "index.css"), "body []")
+        os.utime(os.path.join(self.static, "index.css"), ns=(5, 5))
+        stats = self.sync()
+        self.assertEqual(stats.copied, 1)
+        self.assertEqual(self.read("index.css"), "body []")
+
+    def test_stale_files_are_removed(self):
+        self.sync()
+        self.write(os.path.join(self.public, "index.html"), "<p>page</p>")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        stats = self.sync()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertEqual(self.read("index.html"), "<p>page</p>")
+
+    def test_without_record_nothing_is_removed(self):
+        sync_tree(self.static, self.public)
+        os.remove(os.path.join(self.static, "index.css"))
+        stats = sync_tree(self.static, self.public)
+        self.assertEqual(stats.removed, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.css")))
+
+    def test_link_mode(self):
+        self.sync(link=True)
+        src = os.stat(os.path.join(self.static, "index.css"))
+        dst = os.stat(os.path.join(self.public, "index.css"))
+        self.assertEqual(src.st_ino, dst.st_ino)
+
+    def test_copy_never_writes_into_an_existing_inode(self):
+        other = os.path.join(self.root, "other.css")
+        self.write(other, "other file")
+        os.makedirs(self.public)
+        os.link(other, os.path.join(self.public, "index.css"))
+        self.sync()
+        self.assertEqual(self.read("index.css"), "body {}")
+        with open(other) as f:
+            self.assertEqual(f.read(), "other file")
+
+
+if __name__ == "__main__":
+    unittest.main()
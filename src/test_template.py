@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, compile_template, fill_slots, load_template
+
+
+class TestCompileTemplate(unittest.TestCase):
+    def test_segments_and_slots(self):
+        template = compile_template("<title>{{ Title }}</title>{{ Content }}!")
+        self.assertEqual(template.segments, ["<title>", "</title>", "!"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_no_placeholders(self):
+        template = compile_template("<p>static</p>")
+        self.assertEqual(template.segments, ["<p>static</p>"])
+        self.assertEqual(template.slots, [])
+
+    def test_render_matches_replace(self):
+        text = "<h1>{{ Title }}</h1>\n<div>{{ Content }}</div>\n"
+        template = compile_template(text)
+        values = {"Title": "Hello", "Content": "<p>world</p>"}
+        expected = text.replace("{{ Title }}", "Hello").replace(
+            "{{ Content }}", "<p>world</p>"
+        )
+        self.assertEqual(template.render_to_string(values), expected)
+
+    def test_render_to_writer(self):
+        template = compile_template("a{{ X }}b{{ Y }}c")
+        out = []
+        template.render(out.append, {"X": "1", "Y": "2"})
+        self.assertEqual(out, ["a", "1", "b", "2", "c"])
+
+    def test_callable_value_is_streamed(self):
+        template = compile_template("<div>{{ Content }}</div>")
+        out = []
+        template.render(out.append, {"Content": lambda write: write("a") or write("b")})
+        self.assertEqual(out, ["<div>", "a", "b", "</div>"])
+
+    def test_repeated_and_extra_slots(self):
+        template = compile_template(
+            "{{ Title }}|{{ Date }}|{{ Description }}|{{ SiteName }}|{{ Title }}"
+        )
+        values = {
+            "Title": "T",
+            "Date": "2024-06-22",
+            "Description": "D",
+            "SiteName": "S",
+        }
+        self.assertEqual(template.render_to_string(values), "T|2024-06-22|D|S|T")
+
+    def test_missing_value_keeps_placeholder(self):
+        template = compile_template("<p>{{ Date }}</p>")
+        self.assertEqual(template.render_to_string({}), "<p>{{ Date }}</p>")
+
+    def test_fill_slots(self):
+        template = compile_template("<h1>{{ Site }}</h1>{{ Content }}<p>{{ Site }}</p>")
+        filled = fill_slots(template, {"Site": "Blog"})
+        self.assertEqual(filled.slots, ["Content"])
+        self.assertEqual(
+            filled.render_to_string({"Content": "x"}), "<h1>Blog</h1>x<p>Blog</p>"
+        )
+        self.assertNotEqual(filled.digest, template.digest)
+
+    def test_segment_slot_mismatch(self):
+        with self.assertRaises(ValueError):
+            Template(["a"], ["Title"])
+
+
+class TestPartials(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_partial_is_inlined(self):
+        self.write("partials/head.html", "<title>{{ Title }}</title>")
+        path = self.write("template.html", "<head>{{> partials/head.html }}</head>")
+        template = load_template(path)
+        self.assertEqual(template.segments, ["<head><title>", "</title></head>"])
+        self.assertEqual(template.slots, ["Title"])
+
+    def test_nested_partials_resolve_relative_to_includer(self):
+        self.write("partials/nav.html", "<nav>{{ SiteName }}</nav>")
+        self.write("partials/header.html", "<header>{{> nav.html }}</header>")
+        path = self.write("template.html", "{{> partials/header.html }}{{ Content }}")
+        template = load_template(path)
+        self.assertEqual(
+            template.render_to_string({"SiteName": "S", "Content": "C"}),
+            "<header><nav>S</nav></header>C",
+        )
+
+    def test_recursive_partial(self):
+        self.write("loop.html", "{{> template.html }}")
+        path = self.write("template.html", "{{> loop.html }}")
+        with self.assertRaises(ValueError):
+            load_template(path)
+
+    def test_partial_change_changes_digest(self):
+        self.write("foot.html", "v1")
+        path = self.write("template.html", "{{ Content }}{{> foot.html }}")
+        before = load_template(path).digest
+        self.write("foot.html", "v2")
+        self.assertNotEqual(before, load_template(path).digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,10 @@ from textnode import (
     split_nodes_delimiter,
     split_nodes_image,
     split_nodes_link,
+    scan_inline,
+    set_asset_urls,
     text_node_to_html_node,
+    text_to_textnodes,
 )
 
 
@@ -37,6 +40,59 @@ class TestTextNode(unittest.TestCase):
         expected_repr = "TextNode('This is a text node', 'bold', 'example.com')"
         self.assertEqual(repr(node), expected_repr)
 
+    def test_slots(self):
+        node = TextNode("This is a text node", "bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = True
+
+
+class TestTextNodeToHTMLNode(unittest.TestCase):
+    def test_simple_types(self):
+        for text_type, tag in [
+            ("text", None),
+            ("bold", "b"),
+            ("italic", "i"),
+            ("code", "code"),
+        ]:
+            with self.subTest(text_type=text_type):
+                node = text_node_to_html_node(TextNode("value", text_type))
+                self.assertEqual(node.tag, tag)
+                self.assertEqual(node.value, "value")
+                self.assertIsNone(node.props)
+
+    def test_link(self):
+        node = text_node_to_html_node(TextNode("home", "link", "/"))
+        self.assertEqual(node.to_html(), '<a href="/" target="_blank">home</a>')
+
+    def test_image(self):
+        node = text_node_to_html_node(TextNode("alt", "image", "/a.png"))
+        self.assertEqual(node.to_html(), '<img src="/a.png" alt="alt"></img>')
+
+    def test_asset_urls(self):
+        set_asset_urls(
+            {
+                "/a.png": ("/a.0123abcd.png", 640, 480),
+                "/doc.svg": ("/doc.4567cdef.svg", None, None),
+            }
+        )
+        self.addCleanup(set_asset_urls, {})
+        node = text_node_to_html_node(TextNode("alt", "image", "/a.png"))
+        self.assertEqual(
+            node.to_html(),
+            '<img src="/a.0123abcd.png" alt="alt" width="640" height="480"></img>',
+        )
+        node = text_node_to_html_node(TextNode("doc", "link", "/doc.svg"))
+        self.assertEqual(
+            node.to_html(), '<a href="/doc.4567cdef.svg" target="_blank">doc</a>'
+        )
+        node = text_node_to_html_node(TextNode("alt", "image", "/b.png"))
+        self.assertEqual(node.to_html(), '<img src="/b.png" alt="alt"></img>')
+
+    def test_invalid_type(self):
+        with self.assertRaises(ValueError):
+            text_node_to_html_node(TextNode("value", "underline"))
+
 
 class TestSplitNodesDelimiter(unittest.TestCase):
     def test_split_nodes_delimiter_bold(self):
@@ -183,5 +239,70 @@ class TestSplitNodesLink(unittest.TestCase):
         self.assertEqual(split_nodes_link(old_nodes), expected_output)
 
 
+class TestScanInline(unittest.TestCase):
+    def legacy(self, text):
+        nodes = [TextNode(text, "text")]
+        nodes = split_nodes_delimiter(nodes, "**", "bold")
+        nodes = split_nodes_delimiter(nodes, "*", "italic")
+        nodes = split_nodes_delimiter(nodes, "`", "code")
+        return nodes
+
+    def test_matches_delimiter_pipeline(self):
+        for text in [
+            "plain text",
+            "Hello **world**",
+            "**bold** then *italic* then `code` end",
+            "*a* *b* **c** `d` e",
+            "**a*b** c",
+            "a **** b",
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(scan_inline(text), self.legacy(text))
+
+    def test_empty_string(self):
+        self.assertEqual(scan_inline(""), [])
+
+    def test_keeps_text_around_images_and_links(self):
+        text = "See ![alt](/a.png) and [home](/) now"
+        expected = [
+            TextNode("See ", "text"),
+            TextNode("alt", "image", "/a.png"),
+            TextNode(" and ", "text"),
+            TextNode("home", "link", "/"),
+            TextNode(" now", "text"),
+        ]
+        self.assertEqual(scan_inline(text), expected)
+
+    def test_code_is_not_scanned_for_delimiters(self):
+        self.assertEqual(
+            scan_inline("run `a * b` now"),
+            [
+                TextNode("run ", "text"),
+                TextNode("a * b", "code"),
+                TextNode(" now", "text"),
+            ],
+        )
+
+    def test_link_url_is_not_scanned_for_delimiters(self):
+        self.assertEqual(
+            scan_inline("[x](/a*b)"),
+            [TextNode("x", "link", "/a*b")],
+        )
+
+    def test_lone_brackets_are_text(self):
+        text = "a [b] ! c ![ d ["
+        self.assertEqual(scan_inline(text), [TextNode(text, "text")])
+
+    def test_unclosed_delimiter(self):
+        for text in ["Hello **world", "Hello *world", "Hello `world"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    scan_inline(text)
+
+    def test_text_to_textnodes_wraps_scanner(self):
+        text = "**b** [l](u) ![i](s)"
+        self.assertEqual(text_to_textnodes(text), scan_inline(text))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,182 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import main
+from watch import LIVERELOAD_MARKER, DependencyGraph, Watcher, changed_files
+
+
+TEMPLATE = "<html><body>{{ Content }}</body></html>"
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_affected(self):
+        graph = DependencyGraph()
+        graph.set_dependencies("a.md", {"template.html", "static/x.png"})
+        graph.set_dependencies("b.md", {"template.html"})
+        self.assertEqual(graph.affected({"template.html"}), {"a.md", "b.md"})
+        self.assertEqual(graph.affected({"static/x.png"}), {"a.md"})
+        self.assertEqual(graph.affected({"static/y.png"}), set())
+
+    def test_set_dependencies_replaces_old_edges(self):
+        graph = DependencyGraph()
+        graph.set_dependencies("a.md", {"static/x.png"})
+        graph.set_dependencies("a.md", {"static/y.png"})
+        self.assertEqual(graph.affected({"static/x.png"}), set())
+        self.assertEqual(graph.affected({"static/y.png"}), {"a.md"})
+
+    def test_remove(self):
+        graph = DependencyGraph()
+        graph.set_dependencies("a.md", {"template.html"})
+        graph.remove("a.md")
+        self.assertEqual(graph.dependents, {})
+
+    def test_changed_files(self):
+        before = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+        after = {"a": (1, 1), "b": (2, 1), "d": (1, 1)}
+        self.assertEqual(changed_files(before, after), {"b", "c", "d"})
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(
+            os.path.join(self.content, "index.md"), "# Home\n\n![a](/images/a.png)"
+        )
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\ntext")
+        self.watcher = Watcher(
+            self.content,
+            self.template,
+            self.static,
+            self.public,
+            manifest_path=os.path.join(self.root, ".build", "manifest.json"),
+            record_path=os.path.join(self.root, ".build", "static.json"),
+            block_cache_path=os.path.join(self.root, ".build", "blocks.sqlite"),
+        )
+        self.index = os.path.join(self.public, "index.html")
+        self.post = os.path.join(self.public, "post", "index.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.built = self.watcher.build()
+
+    def tearDown(self):
+        self.watcher.block_cache.close()
+        self.tmp.cleanup()
+
+    def write(self, path, text, mtime=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_initial_build(self):
+        self.assertEqual(sorted(self.built), sorted([self.index, self.post]))
+        self.assertIn("EventSource", self.read(self.index))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "images", "a.png")))
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), [])
+
+    def test_edited_page_only(self):
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nnew", 1)
+        self.assertEqual(self.watcher.poll(), [self.post])
+        self.assertIn("new", self.read(self.post))
+
+    def test_template_change_rebuilds_every_page(self):
+        self.write(self.template, TEMPLATE.replace("<body>", "<body><nav></nav>"), 1)
+        self.assertEqual(sorted(self.watcher.poll()), sorted([self.index, self.post]))
+        self.assertIn("<nav></nav>", self.read(self.post))
+
+    def test_image_change_rebuilds_referencing_pages(self):
+        self.write(os.path.join(self.static, "images", "a.png"), "new png", 1)
+        self.assertEqual(self.watcher.poll(), [self.index])
+        self.assertEqual(
+            self.read(os.path.join(self.public, "images", "a.png")), "new png"
+        )
+
+    def test_new_and_removed_pages(self):
+        self.write(os.path.join(self.content, "new.md"), "# New")
+        self.assertEqual(self.watcher.poll(), [os.path.join(self.public, "new.html")])
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertFalse(os.path.exists(self.post))
+
+    def test_render_error_does_not_stop_watching(self):
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\n`oops", 1)
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            self.assertEqual(self.watcher.poll(), [])
+        self.assertIn("error rendering", log.getvalue())
+        self.assertEqual(self.watcher.poll(), [])
+
+    def test_edit_only_renders_new_blocks(self):
+        self.write(
+            os.path.join(self.content, "post", "index.md"), "# Post\n\ntext\n\nnew", 1
+        )
+        cache = self.watcher.block_cache
+        hits = cache.hits
+        self.watcher.poll()
+        self.assertEqual(cache.hits - hits, 2)
+        self.assertIn("<p>new</p>", self.read(self.post))
+
+    def test_reload_marker_is_touched(self):
+        marker = os.path.join(self.public, LIVERELOAD_MARKER)
+        before = self.read(marker)
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nnew", 1)
+        self.watcher.poll()
+        self.assertNotEqual(self.read(marker), before)
+
+
+class TestWatchThenBuild(unittest.TestCase):
+    # the watcher and full builds run from the same directory, with the
+    # default paths each of them uses
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+        self.write("template.html", TEMPLATE)
+        self.write("static/a.css", "body {}")
+        self.write("content/index.md", "# Home\n\ntext")
+        self.write("content/post/index.md", "# Post\n\ntext")
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.main(["--no-gzip"])
+
+    def test_deleted_while_watching_is_removed_by_next_build(self):
+        self.build()
+        watcher = Watcher("./content", "./template.html", "./static")
+        self.addCleanup(watcher.block_cache.close)
+        with contextlib.redirect_stdout(io.StringIO()):
+            watcher.build()
+        os.remove("content/post/index.md")
+        os.remove("static/a.css")
+        watcher.poll()
+        self.build()
+        self.assertTrue(os.path.exists("public/index.html"))
+        self.assertFalse(os.path.exists("public/post/index.html"))
+        self.assertFalse(os.path.exists("public/a.css"))
+        with open("public/index.html") as f:
+            self.assertNotIn("EventSource", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
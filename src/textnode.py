@@ -21,6 +21,8 @@ valid_text_types = {
 
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text: str, text_type: str, url: str = None) -> None:
         self.text = text
         self.text_type = text_type
@@ -39,28 +41,51 @@ class TextNode:
         return f"TextNode('{self.text}', '{self.text_type}', '{self.url}')"
 
 
+# root-relative url -> (fingerprinted url, width, height) of static assets,
+# installed by the build; links and images to anything else keep their url
+asset_urls = {}
+
+
+def set_asset_urls(urls: dict) -> None:
+    global asset_urls
+    asset_urls = urls
+
+
+def link_props(node: TextNode) -> dict:
+    asset = asset_urls.get(node.url)
+    return {"href": node.url if asset is None else asset[0], "target": "_blank"}
+
+
+def image_props(node: TextNode) -> dict:
+    asset = asset_urls.get(node.url)
+    if asset is None:
+        return {"src": node.url, "alt": node.text}
+    url, width, height = asset
+    props = {"src": url, "alt": node.text}
+    # known dimensions let the browser reserve the space before it loads
+    if width is not None:
+        props["width"] = width
+        props["height"] = height
+    return props
+
+
+text_node_builders = {
+    "text": lambda node: LeafNode(tag=None, value=node.text),
+    "bold": lambda node: LeafNode(tag="b", value=node.text),
+    "italic": lambda node: LeafNode(tag="i", value=node.text),
+    "code": lambda node: LeafNode(tag="code", value=node.text),
+    "link": lambda node: LeafNode(tag="a", value=node.text, props=link_props(node)),
+    "image": lambda node: LeafNode(tag="img", value="", props=image_props(node)),
+}
+
+
 def text_node_to_html_node(text_node: TextNode) -> HTMLNode:
-    if text_node.text_type not in text_types.values():
+    builder = text_node_builders.get(text_node.text_type)
+    if builder is None:
         raise ValueError(
             f"Invalid text_type: {text_node.text_type}. Valid types are: {', '.join(text_types.values())}"
         )
-
-    node_mappings = {
-        "text": lambda: LeafNode(tag=None, value=text_node.text),
-        "bold": lambda: LeafNode(tag="b", value=text_node.text),
-        "italic": lambda: LeafNode(tag="i", value=text_node.text),
-        "code": lambda: LeafNode(tag="code", value=text_node.text),
-        "link": lambda: LeafNode(
-            tag="a",
-            value=text_node.text,
-            props={"href": text_node.url, "target": "_blank"},
-        ),
-        "image": lambda: LeafNode(
-            tag="img", value="", props={"src": text_node.url, "alt": text_node.text}
-        ),
-    }
-
-    return node_mappings[text_node.text_type]()
+    return builder(text_node)
 
 
 def split_nodes_delimiter(
@@ -111,23 +136,81 @@ def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
     return new_nodes
 
 
+# alt/link text may not contain brackets and urls may not contain parentheses,
+# so a failed match at one "[" never scans past the next bracket; a lazy ".*?"
+# rescans to the end of the text from every "[" and goes quadratic
+inline_special_pattern = re.compile(r"[*`!\[]")
+inline_image_pattern = re.compile(r"!\[(?P<alt>[^\[\]]*)\]\((?P<link>[^()]*)\)")
+inline_link_pattern = re.compile(r"\[(?P<text>[^\[\]]*)\]\((?P<url>[^()]*)\)")
+
+
 def extract_markdown_images(text: str) -> list[tuple]:
-    image_pattern = r"!\[(?P<alt>.*?)\]\((?P<link>.*?)\)"
-    matches = re.findall(image_pattern, text)
+    matches = inline_image_pattern.findall(text)
     return [(alt, link) for alt, link in matches]
 
 
 def extract_markdown_links(text: str) -> list[tuple]:
-    link_pattern = r"\[(?P<text>.*?)\]\((?P<url>.*?)\)"
-    matches = re.findall(link_pattern, text)
+    matches = inline_link_pattern.findall(text)
     return [(text, url) for text, url in matches]
 
 
+def referenced_assets(text: str) -> list[tuple]:
+    # the asset entries the links and images in text resolve to, the only
+    # thing outside text that html rendered from it depends on; the link
+    # pattern also matches the bracketed part of every image
+    if not asset_urls or "](" not in text:
+        return []
+    urls = {url for _, url in extract_markdown_links(text)}
+    return sorted((url, asset_urls[url]) for url in urls if url in asset_urls)
+
+
+def scan_inline(text: str) -> list[TextNode]:
+    # one left-to-right pass: plain text accumulates until a delimiter, image
+    # or link is recognised, and everything between matches is kept as text
+    nodes = []
+    text_start = 0
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = inline_special_pattern.search(text, pos)
+        if match is None:
+            break
+        start = match.start()
+        char = text[start]
+
+        if char == "`" or char == "*":
+            if char == "`":
+                delimiter, text_type = "`", "code"
+            elif text.startswith("**", start):
+                delimiter, text_type = "**", "bold"
+            else:
+                delimiter, text_type = "*", "italic"
+            inner_start = start + len(delimiter)
+            end = text.find(delimiter, inner_start)
+            if end == -1:
+                raise ValueError("Closing delimiter not found")
+            node = TextNode(text[inner_start:end], text_type)
+            pos = end + len(delimiter)
+        else:
+            pattern = inline_image_pattern if char == "!" else inline_link_pattern
+            found = pattern.match(text, start)
+            if found is None:
+                # a lone "!" or "[" is ordinary text
+                pos = start + 1
+                continue
+            text_type = "image" if char == "!" else "link"
+            node = TextNode(found.group(1), text_type, found.group(2))
+            pos = found.end()
+
+        if start > text_start:
+            nodes.append(TextNode(text[text_start:start], "text"))
+        nodes.append(node)
+        text_start = pos
+
+    if text_start < length:
+        nodes.append(TextNode(text[text_start:], "text"))
+    return nodes
+
+
 def text_to_textnodes(text: str) -> list[TextNode]:
-    whole_text_nodes = [TextNode(text, text_types["text_type_text"])]
-    split_nodes = split_nodes_delimiter(whole_text_nodes, "**", "bold")
-    split_nodes = split_nodes_delimiter(split_nodes, "*", "italic")
-    split_nodes = split_nodes_delimiter(split_nodes, "`", "code")
-    split_nodes = split_nodes_image(split_nodes)
-    split_nodes = split_nodes_link(split_nodes)
-    return split_nodes
+    return scan_inline(text)
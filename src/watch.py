@@ -0,0 +1,277 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from block_cache import BlockCache
+from html_markdown import RENDERER_VERSION
+from main import (
+    copy_files,
+    find_pages,
+    read_source,
+    source_values,
+    template_value,
+    write_page,
+)
+from manifest import BuildManifest
+from sync import scan_files
+from template import fill_slots, inject_before, load_template
+from textnode import extract_markdown_images
+
+
+# must match LIVERELOAD_PATH and LIVERELOAD_MARKER in server.py
+LIVERELOAD_SCRIPT = (
+    '<script>new EventSource("/__livereload").onmessage = '
+    "() => location.reload();</script>\n"
+)
+LIVERELOAD_MARKER = ".livereload"
+# a watch session builds into its own output with its own manifest and
+# records: sharing the full build's would let a page or static file deleted
+# while watching drop out of them and never be removed from the staging tree
+WATCH_DIR = "./.build/watch"
+WATCH_OUTPUT_DIR = os.path.join(WATCH_DIR, "public")
+WATCH_MANIFEST_PATH = os.path.join(WATCH_DIR, "manifest.json")
+WATCH_RECORD_PATH = os.path.join(WATCH_DIR, "static.json")
+WATCH_BLOCK_CACHE_PATH = os.path.join(WATCH_DIR, "blocks.sqlite")
+
+
+class DependencyGraph:
+    def __init__(self) -> None:
+        self.dependencies = {}
+        self.dependents = {}
+
+    def set_dependencies(self, page: str, dependencies) -> None:
+        self.remove(page)
+        self.dependencies[page] = set(dependencies)
+        for dependency in self.dependencies[page]:
+            self.dependents.setdefault(dependency, set()).add(page)
+
+    def remove(self, page: str) -> None:
+        for dependency in self.dependencies.pop(page, ()):
+            pages = self.dependents[dependency]
+            pages.discard(page)
+            if not pages:
+                del self.dependents[dependency]
+
+    def affected(self, changed) -> set[str]:
+        pages = set()
+        for path in changed:
+            pages |= self.dependents.get(path, set())
+        return pages
+
+
+def snapshot(roots) -> dict[str, tuple[int, int]]:
+    files = {}
+    for root in roots:
+        if os.path.isfile(root):
+            st = os.stat(root)
+            files[os.path.normpath(root)] = (st.st_mtime_ns, st.st_size)
+        elif os.path.isdir(root):
+            for _, entry in scan_files(root):
+                st = entry.stat()
+                files[os.path.normpath(entry.path)] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def changed_files(before: dict, after: dict) -> set[str]:
+    changed = {path for path, stat in after.items() if before.get(path) != stat}
+    return changed | (before.keys() - after.keys())
+
+
+class Watcher:
+    def __init__(
+        self,
+        content_dir: str,
+        template_path: str,
+        static_dir: str,
+        dest_dir: str = WATCH_OUTPUT_DIR,
+        livereload: bool = True,
+        manifest_path: str = WATCH_MANIFEST_PATH,
+        record_path: str = WATCH_RECORD_PATH,
+        block_cache_path: str = WATCH_BLOCK_CACHE_PATH,
+        site_values: dict = None,
+    ) -> None:
+        self.content_dir = os.path.normpath(content_dir)
+        self.template_path = template_path
+        self.static_dir = os.path.normpath(static_dir)
+        self.dest_dir = dest_dir
+        self.livereload = livereload
+        self.manifest_path = manifest_path
+        self.record_path = record_path
+        self.site_values = site_values or {}
+        self.graph = DependencyGraph()
+        self.pages = {}
+        self.files = {}
+        self.template = None
+        self.manifest = None
+        # an edit usually touches one block, the rest come from here
+        self.block_cache = BlockCache(block_cache_path, RENDERER_VERSION)
+
+    def roots(self) -> list[str]:
+        return [self.content_dir, self.static_dir, *self.template.dependencies]
+
+    def load_template(self) -> None:
+        template = fill_slots(load_template(self.template_path), self.site_values)
+        if self.livereload:
+            template = inject_before(template, "</body>", LIVERELOAD_SCRIPT)
+        self.template = template
+        self.manifest = BuildManifest.load(
+            self.manifest_path, template.digest, RENDERER_VERSION
+        )
+
+    def dest_for(self, source: str) -> str:
+        rel_path = os.path.relpath(source, self.content_dir)
+        return os.path.join(self.dest_dir, os.path.splitext(rel_path)[0] + ".html")
+
+    def page_dependencies(self, md_file: str) -> set[str]:
+        dependencies = set(self.template.dependencies)
+        for _, url in extract_markdown_images(md_file):
+            if url.startswith("/"):
+                dependencies.add(
+                    os.path.normpath(os.path.join(self.static_dir, url.lstrip("/")))
+                )
+        return dependencies
+
+    def render(self, source: str, force: bool = True) -> bool:
+        dest = self.pages[source]
+        md_file, source_hash = read_source(source)
+        self.graph.set_dependencies(source, self.page_dependencies(md_file))
+        if not force and self.manifest.is_fresh(source, dest, source_hash):
+            return False
+        values = source_values(source, self.template)
+        write_page(md_file, self.template, dest, self.block_cache, values=values)
+        self.manifest.record(source, dest, source_hash)
+        return True
+
+    def remove(self, source: str) -> None:
+        dest = self.pages.pop(source)
+        self.graph.remove(source)
+        self.manifest.pages.pop(source, None)
+        if os.path.exists(dest):
+            os.remove(dest)
+
+    def build(self) -> list[str]:
+        self.load_template()
+        copy_files(self.static_dir, self.dest_dir, record_path=self.record_path)
+        rebuilt = []
+        for source, dest in find_pages(self.content_dir, self.dest_dir):
+            source = os.path.normpath(source)
+            self.pages[source] = dest
+            if self.render(source, force=False):
+                rebuilt.append(dest)
+        self.manifest.prune()
+        self.files = snapshot(self.roots())
+        self.finish()
+        return rebuilt
+
+    def poll(self) -> list[str]:
+        files = snapshot(self.roots())
+        changed = changed_files(self.files, files)
+        if not changed:
+            return []
+        # a page that fails to render is retried on its next edit, not every poll
+        self.files = files
+
+        to_render = set()
+        if changed & set(self.template.dependencies):
+            self.load_template()
+            to_render.update(self.pages)
+        if any(is_within(path, self.static_dir) for path in changed):
+            copy_files(self.static_dir, self.dest_dir, record_path=self.record_path)
+        for path in changed:
+            if not is_within(path, self.content_dir) or not path.endswith(".md"):
+                continue
+            if path in files:
+                self.pages.setdefault(path, self.dest_for(path))
+                to_render.add(path)
+            elif path in self.pages:
+                self.remove(path)
+        to_render |= self.graph.affected(changed)
+
+        rebuilt = []
+        for source in sorted(to_render):
+            if source not in self.pages:
+                continue
+            try:
+                self.render(source)
+            except ValueError as e:
+                print(f"error rendering {source}: {e}")
+                continue
+            rebuilt.append(self.pages[source])
+        self.finish()
+        return rebuilt
+
+    def finish(self) -> None:
+        self.manifest.save()
+        self.block_cache.save()
+        if self.livereload:
+            with open(os.path.join(self.dest_dir, LIVERELOAD_MARKER), "w") as f:
+                f.write(str(time.time_ns()))
+
+
+def is_within(path: str, directory: str) -> bool:
+    return path == directory or path.startswith(directory + os.sep)
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Rebuild the site on changes")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--interval", type=float, default=0.2, help="Seconds between polls"
+    )
+    parser.add_argument(
+        "--no-serve", action="store_true", help="Only rebuild, don't start server.py"
+    )
+    parser.add_argument(
+        "--value",
+        type=template_value,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Fill {{ NAME }} on every page with VALUE, inserted as html",
+    )
+    args = parser.parse_args(argv)
+
+    site_values = {"SiteUrl": f"http://localhost:{args.port}", **dict(args.value)}
+    watcher = Watcher(
+        "./content", "./template.html", "./static", site_values=site_values
+    )
+    start = time.perf_counter()
+    watcher.build()
+    print(f"built in {(time.perf_counter() - start) * 1e3:.0f} ms, watching...")
+
+    server = None
+    if not args.no_serve:
+        server_path = os.path.join(os.path.dirname(__file__), "..", "server.py")
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                server_path,
+                "--dir",
+                WATCH_OUTPUT_DIR,
+                "--port",
+                str(args.port),
+                "--livereload",
+            ]
+        )
+    try:
+        while True:
+            time.sleep(args.interval)
+            start = time.perf_counter()
+            rebuilt = watcher.poll()
+            if rebuilt:
+                elapsed = (time.perf_counter() - start) * 1e3
+                print(f"rebuilt {len(rebuilt)} pages in {elapsed:.1f} ms")
+                for dest in rebuilt:
+                    print(f"  {dest}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()